@@ -0,0 +1,763 @@
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, time, timedelta
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import class_row, kwargs_row
+from psycopg.types.json import Json
+from psycopg_pool import AsyncConnectionPool
+
+from routine_bot.cache import chat_cache
+from routine_bot.constants import (
+    DATABASE_URL,
+    DB_POOL_MAX_IDLE,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    FREE_PLAN_MAX_EVENTS,
+    TZ_TAIPEI,
+)
+from routine_bot.enums import ChatStatus, OutboxStatus
+from routine_bot.invalidation import CHANNEL, format_payload
+from routine_bot.models import ChatData, EventBatch, EventData, OutboxData, ShareData, UpdateData, UserData
+
+logger = logging.getLogger(__name__)
+
+# First key of the per-user advisory locks, keeps them apart from other two-key advisory locks.
+USER_LOCK_NAMESPACE = 1
+
+# ----------------------------- Connection Pool ------------------------------ #
+
+# Opened in the FastAPI lifespan, see `main.py`.
+# Connections are checked before being handed out and recycled after `max_lifetime`,
+# so stale connections dropped by the server are never given to a handler.
+pool = AsyncConnectionPool(
+    conninfo=DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_IDLE,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    check=AsyncConnectionPool.check_connection,
+    name="routine_bot",
+    open=False,
+)
+
+
+def get_pool_stats() -> dict[str, int]:
+    """
+    Snapshot of the connection pool usage.
+
+    - in_use : connections currently lent to handlers
+    - waiting : requests queued for a connection
+    - timeouts : requests that failed to get a connection (timeouts, queue full)
+    """
+    stats = pool.get_stats()
+    return {
+        "size": stats["pool_size"],
+        "available": stats["pool_available"],
+        "in_use": stats["pool_size"] - stats["pool_available"],
+        "waiting": stats.get("requests_waiting", 0),
+        "timeouts": stats.get("requests_errors", 0),
+    }
+
+
+# ------------------------------ Unit of Work -------------------------------- #
+
+# The functions below never commit on their own.
+# The caller owns the transaction, so all writes of one chat step land in a single commit.
+
+
+@asynccontextmanager
+async def unit_of_work(conn: psycopg.AsyncConnection) -> AsyncIterator[psycopg.AsyncConnection]:
+    """
+    Group the writes of one chat step into one atomic transaction.
+
+    The writes are committed together instead of one by one, each of them still costs a round trip.
+    Inside a transaction that is already open, e.g. the one of a pool connection, the block is
+    a savepoint, committed with the enclosing transaction.
+    """
+    async with conn.transaction():
+        yield conn
+
+
+# ---------------------------- Cache Invalidation ---------------------------- #
+
+
+async def notify_invalidation(entity: str, key: str, conn: psycopg.AsyncConnection) -> None:
+    """
+    Tell the other workers to evict `key` from their `entity` cache, see `invalidation.py`.
+    The notification is delivered when the caller's transaction commits.
+    """
+    await conn.execute("SELECT pg_notify(%s, %s)", (CHANNEL, format_payload(entity, key)))
+
+
+# -------------------------------- User Table -------------------------------- #
+
+
+async def add_user(user_id: str, display_name: str, picture_url: str, conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO users (user_id, display_name, picture_url, premium_until)
+            VALUES (%s, %s, %s, NULL)
+            """,
+            (user_id, display_name, picture_url),
+        )
+    logger.info(f"User inserted: {user_id}")
+
+
+async def get_user(user_id: str, conn: psycopg.AsyncConnection) -> UserData | None:
+    async with conn.cursor(row_factory=class_row(UserData)) as cur:
+        await cur.execute(
+            """
+            SELECT user_id, display_name, picture_url, profile_refreshed_at, notification_time, event_count, is_premium, premium_until, is_active,
+                   is_limited
+            FROM users
+            WHERE user_id = %s
+            """,
+            (user_id,),
+        )
+        return await cur.fetchone()
+
+
+async def is_user_exists(user_id: str, conn: psycopg.AsyncConnection) -> bool:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT 1
+            FROM users
+            WHERE user_id = %s
+            LIMIT 1
+            """,
+            (user_id,),
+        )
+        return await cur.fetchone() is not None
+
+
+async def set_user_profile(user_id: str, display_name: str, picture_url: str, conn: psycopg.AsyncConnection):
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE users
+            SET display_name = %s,
+                picture_url = %s,
+                profile_refreshed_at = %s
+            WHERE user_id = %s
+            """,
+            (display_name, picture_url, datetime.now(tz=TZ_TAIPEI), user_id),
+        )
+    logger.info(f"User profile updated: {user_id}")
+
+
+async def increment_user_event_count(user_id: str, by: int, conn: psycopg.AsyncConnection):
+    """
+    Change the event count of the user by `by`, and update whether the user is over the free plan limit.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE users
+            SET event_count = event_count + %(by)s,
+                is_limited = event_count + %(by)s > %(max_events)s
+                    AND (premium_until IS NULL OR premium_until <= NOW())
+            WHERE user_id = %(user_id)s
+            """,
+            {"by": by, "max_events": FREE_PLAN_MAX_EVENTS, "user_id": user_id},
+        )
+    logger.info(f"User event count updated by {by}")
+
+
+async def refresh_premium_limits(conn: psycopg.AsyncConnection) -> tuple[int, int]:
+    """
+    Bring `is_limited` up to date with the premium access of the users, in bulk.
+
+    Flags the users over the free plan limit whose premium access has expired since the last sweep,
+    and clears the flag of the users who got premium access. Returns the number of users limited and unlimited.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE users
+            SET is_limited = TRUE
+            WHERE NOT is_limited
+              AND premium_until <= NOW()
+              AND event_count > %s
+            """,
+            (FREE_PLAN_MAX_EVENTS,),
+        )
+        limited = cur.rowcount
+        await cur.execute(
+            """
+            UPDATE users
+            SET is_limited = FALSE
+            WHERE is_limited
+              AND premium_until > NOW()
+            """
+        )
+        unlimited = cur.rowcount
+    if limited or unlimited:
+        logger.info(f"Users limited after premium expiry: {limited}, unlimited after premium grant: {unlimited}")
+    return limited, unlimited
+
+
+async def set_user_activeness(user_id: str, to: bool, conn: psycopg.AsyncConnection) -> bool:
+    """
+    Set the activeness of the user, all of their events and the shares they receive in one statement.
+
+    Returns `False` if the user does not exist, in which case nothing is updated.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            WITH updated_user AS (
+                UPDATE users
+                SET is_active = %(to)s
+                WHERE user_id = %(user_id)s
+                RETURNING user_id
+            ), updated_events AS (
+                UPDATE events
+                SET is_active = %(to)s
+                WHERE user_id IN (SELECT user_id FROM updated_user)
+                    AND is_active IS DISTINCT FROM %(to)s
+                RETURNING event_id
+            ), updated_shares AS (
+                UPDATE shares
+                SET is_active = %(to)s
+                WHERE recipient_id IN (SELECT user_id FROM updated_user)
+                    AND is_active IS DISTINCT FROM %(to)s
+                RETURNING share_id
+            )
+            SELECT
+                (SELECT COUNT(*) FROM updated_user),
+                (SELECT COUNT(*) FROM updated_events),
+                (SELECT COUNT(*) FROM updated_shares)
+            """,
+            {"user_id": user_id, "to": to},
+        )
+        users, events, shares = await cur.fetchone()
+    if not users:
+        return False
+    logger.info(f"User activeness updated: {user_id}, {events} events, {shares} shares")
+    return True
+
+
+async def lock_user(user_id: str, conn: psycopg.AsyncConnection) -> None:
+    """
+    Serialize the transactions of one user across workers, released when the transaction ends.
+    Two messages of the same user handled by different workers would otherwise race on the chat row.
+    """
+    await conn.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (USER_LOCK_NAMESPACE, user_id))
+
+
+# -------------------------------- Chat Table -------------------------------- #
+
+
+class StaleChatError(Exception):
+    """
+    The chat was written since this copy of it was read.
+    """
+
+
+async def add_chat(chat: ChatData, conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO chats (chat_id, user_id, chat_type, current_step, payload, status)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (
+                chat.chat_id,
+                chat.user_id,
+                chat.chat_type,
+                chat.current_step,
+                Json(chat.payload),
+                ChatStatus.ONGOING.value,
+            ),
+        )
+    await notify_invalidation("chat", chat.user_id, conn)
+    chat_cache.set(chat.user_id, chat)
+    logger.info(f"Chat inserted: {chat.chat_id}")
+
+
+async def get_ongoing_chat(user_id: str, conn: psycopg.AsyncConnection) -> ChatData | None:
+    """
+    Return the ongoing chat of the user, served from `chat_cache` when possible.
+    """
+    chat = chat_cache.get(user_id)
+    if chat is not None:
+        return chat
+    async with conn.cursor(row_factory=class_row(ChatData)) as cur:
+        await cur.execute(
+            """
+            SELECT chat_id, user_id, chat_type, current_step, payload, status, version
+            FROM chats
+            WHERE user_id = %s AND status = %s
+            """,
+            (user_id, ChatStatus.ONGOING.value),
+        )
+        chat = await cur.fetchone()
+    if chat is not None:
+        chat_cache.set(user_id, chat)
+    return chat
+
+
+async def set_chat_state(chat: ChatData, conn: psycopg.AsyncConnection) -> None:
+    """
+    Persist `current_step`, `payload` and `status` of the chat in one statement.
+
+    The write only applies if the stored chat is still at `chat.version`, otherwise `StaleChatError` is raised.
+    This happens when the chat came from `chat_cache` and another worker wrote it before the invalidation
+    arrived. The caller should evict the cached chat and redo the step on the stored one.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE chats
+            SET current_step = %s,
+                payload = %s,
+                status = %s,
+                version = version + 1
+            WHERE chat_id = %s AND version = %s
+            RETURNING version
+            """,
+            (chat.current_step, Json(chat.payload), chat.status, chat.chat_id, chat.version),
+        )
+        result = await cur.fetchone()
+    if result is None:
+        raise StaleChatError(f"Chat written since it was read: {chat.chat_id}")
+    chat.version = result[0]
+    await notify_invalidation("chat", chat.user_id, conn)
+    if chat.status == ChatStatus.ONGOING:
+        chat_cache.set(chat.user_id, chat)
+    else:
+        chat_cache.evict(chat.user_id)
+    logger.info(f"Chat state updated: {chat.chat_id}")
+
+
+# -------------------------------- Event Table ------------------------------- #
+
+
+async def add_event(event: EventData, conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO events (
+                event_id, event_name, user_id, last_done_at, reminder,
+                reminder_cycle_count, reminder_cycle_unit, next_reminder
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                event.event_id,
+                event.event_name,
+                event.user_id,
+                event.last_done_at,
+                event.reminder,
+                event.reminder_cycle_count,
+                event.reminder_cycle_unit,
+                event.next_reminder,
+            ),
+        )
+    logger.info(f"Event inserted: {event.event_id}")
+
+
+async def get_event(event_id: str, conn: psycopg.AsyncConnection) -> EventData | None:
+    async with conn.cursor(row_factory=class_row(EventData)) as cur:
+        await cur.execute(
+            """
+            SELECT event_id, event_name, user_id, last_done_at, reminder, reminder_cycle_count, reminder_cycle_unit,
+                   next_reminder, last_notification_sent_at, share_count
+            FROM events
+            WHERE event_id = %s
+            """,
+            (event_id,),
+        )
+        return await cur.fetchone()
+
+
+async def get_event_by_name(user_id: str, event_name: str, conn: psycopg.AsyncConnection) -> EventData | None:
+    async with conn.cursor(row_factory=class_row(EventData)) as cur:
+        await cur.execute(
+            """
+            SELECT event_id, event_name, user_id, last_done_at, reminder, reminder_cycle_count, reminder_cycle_unit,
+                   next_reminder, last_notification_sent_at, share_count
+            FROM events
+            WHERE user_id = %s AND event_name = %s
+            """,
+            (user_id, event_name),
+        )
+        return await cur.fetchone()
+
+
+async def get_event_id(user_id: str, event_name: str, conn: psycopg.AsyncConnection) -> str | None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT event_id
+            FROM events
+            WHERE user_id = %s AND event_name = %s
+            """,
+            (user_id, event_name),
+        )
+        result = await cur.fetchone()
+        if result is None:
+            return None
+        return result[0]
+
+
+async def claim_due_reminders(
+    after: tuple[datetime | str, str],
+    limit: int,
+    conn: psycopg.AsyncConnection,
+    notification_slot: tuple[time, time] | None = None,
+) -> EventBatch:
+    """
+    Claim up to `limit` due events ordered by `(next_reminder, event_id)`, starting after the `after` key.
+
+    Rows are locked with `FOR UPDATE SKIP LOCKED`, so concurrent runners claim disjoint batches.
+    The locks are held until the caller's transaction ends, which is where the claimed events
+    should be advanced with `advance_reminders`.
+    Events of users over the free plan limit are left out, they stay due until the user is no longer limited.
+
+    With a `notification_slot`, only the events of users whose `notification_time` falls within it
+    (both ends included) are claimed.
+
+    The batch is capped by `limit`, so its rows are fetched at once rather than streamed
+    through a server-side cursor, which would only add round trips to build the same columns.
+    """
+    slot_filter = sql.SQL("AND u.notification_time BETWEEN %s AND %s") if notification_slot else sql.SQL("")
+    query = sql.SQL(
+        """
+        SELECT e.event_id, e.user_id, e.last_done_at, e.reminder_cycle_count, e.reminder_cycle_unit,
+               e.next_reminder
+        FROM events e
+        JOIN users u ON u.user_id = e.user_id
+        WHERE NOT u.is_limited
+          AND e.is_active = TRUE
+          AND e.reminder = TRUE
+          AND e.next_reminder <= NOW()
+          AND (e.next_reminder, e.event_id) > (%s::timestamptz, %s)
+          {slot_filter}
+        ORDER BY e.next_reminder, e.event_id
+        LIMIT %s
+        FOR UPDATE OF e SKIP LOCKED
+        """
+    ).format(slot_filter=slot_filter)
+    async with conn.cursor() as cur:
+        await cur.execute(query, (*after, *(notification_slot or ()), limit))
+        return EventBatch.from_rows(await cur.fetchall())
+
+
+async def advance_reminders(event_ids: list[str], next_reminders: list[datetime], conn: psycopg.AsyncConnection) -> None:
+    """
+    Move the reminders of the scheduled events to their next occurrence, in a single statement.
+    `last_notification_sent_at` is stamped once the owner's notification is delivered from the outbox.
+    """
+    if not event_ids:
+        return
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE events e
+            SET next_reminder = v.next_reminder
+            FROM unnest(%s::text[], %s::timestamptz[]) AS v(event_id, next_reminder)
+            WHERE e.event_id = v.event_id
+            """,
+            (event_ids, next_reminders),
+        )
+    logger.info(f"Reminders advanced: {len(event_ids)} events")
+
+
+# ------------------------------- Update Table ------------------------------- #
+
+
+async def add_update(update: UpdateData, conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO updates (update_id, event_id, event_name, user_id, done_at)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (
+                update.update_id,
+                update.event_id,
+                update.event_name,
+                update.user_id,
+                update.done_at,
+            ),
+        )
+    logger.info(f"Update inserted: {update.update_id}")
+
+
+async def get_event_recent_update_times(event_id: str, conn: psycopg.AsyncConnection, limit: int = 10) -> list[datetime]:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT done_at
+            FROM updates
+            WHERE event_id = %s
+            ORDER BY done_at DESC
+            LIMIT %s
+            """,
+            (event_id, limit),
+        )
+        result = await cur.fetchall()
+        return [row[0] for row in result]
+
+
+# ------------------------------- Share Table -------------------------------- #
+
+
+async def add_share(share: ShareData, conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO shares (share_id, event_id, event_name, owner_id, recipient_id)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (
+                share.share_id,
+                share.event_id,
+                share.event_name,
+                share.owner_id,
+                share.recipient_id,
+            ),
+        )
+    logger.info(f"Share inserted: {share.share_id}")
+
+
+# ---------------------------- Webhook Event Table --------------------------- #
+
+
+async def claim_webhook_event(webhook_event_id: str, conn: psycopg.AsyncConnection) -> bool:
+    """
+    Record the webhook event, return False if it was already recorded, i.e. it is a redelivery.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO webhook_events (webhook_event_id)
+            VALUES (%s)
+            ON CONFLICT (webhook_event_id) DO NOTHING
+            RETURNING 1
+            """,
+            (webhook_event_id,),
+        )
+        return await cur.fetchone() is not None
+
+
+async def purge_webhook_events(older_than: timedelta, conn: psycopg.AsyncConnection) -> int:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            DELETE FROM webhook_events
+            WHERE received_at < NOW() - %s
+            """,
+            (older_than,),
+        )
+        purged = cur.rowcount
+    logger.info(f"Webhook events purged: {purged}")
+    return purged
+
+
+# ------------------------------- Outbox Table ------------------------------- #
+
+
+async def enqueue_reminders(event_ids: list[str], conn: psycopg.AsyncConnection) -> int:
+    """
+    Schedule a notification for the owner and every active share recipient of the events.
+
+    Meant to run in the transaction that advances the reminders, so a reminder is either both
+    scheduled and advanced, or neither.
+    """
+    if not event_ids:
+        return 0
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO outbox (event_id, recipient_id)
+            SELECT event_id, user_id
+            FROM events
+            WHERE event_id = ANY(%(event_ids)s)
+            UNION ALL
+            SELECT event_id, recipient_id
+            FROM shares
+            WHERE event_id = ANY(%(event_ids)s)
+              AND is_active = TRUE
+            """,
+            {"event_ids": event_ids},
+        )
+        enqueued = cur.rowcount
+    logger.info(f"Notifications enqueued: {enqueued}")
+    return enqueued
+
+
+def _outbox_row(outbox_id: int, recipient_id: str, attempts: int, **event) -> tuple[OutboxData, EventData]:
+    return OutboxData(outbox_id, event["event_id"], recipient_id, attempts), EventData(**event)
+
+
+async def claim_outbox(
+    lease_token: str, limit: int, lease: timedelta, conn: psycopg.AsyncConnection
+) -> list[tuple[OutboxData, EventData]]:
+    """
+    Claim up to `limit` pending notifications that are ready to be sent, oldest first.
+
+    The claim is a lease: the notifications are postponed by `lease`, so they are not claimed again
+    while being sent, and no lock or transaction has to stay open meanwhile. The caller commits the claim,
+    sends, then marks the notifications with `mark_outbox_delivered`, `mark_outbox_failed` or `release_outbox`,
+    passing the same `lease_token`. Notifications of a sender that died are claimed again once the lease runs out.
+    Rows are picked with `FOR UPDATE SKIP LOCKED`, so concurrent senders claim disjoint batches.
+    Each notification is returned together with its event.
+    """
+    async with conn.cursor(row_factory=kwargs_row(_outbox_row)) as cur:
+        await cur.execute(
+            """
+            WITH claimed AS (
+                SELECT outbox_id
+                FROM outbox
+                WHERE status = %(pending)s
+                  AND available_at <= NOW()
+                ORDER BY available_at, outbox_id
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE outbox o
+            SET available_at = NOW() + %(lease)s,
+                lease_token = %(lease_token)s
+            FROM claimed c, events e
+            WHERE o.outbox_id = c.outbox_id
+              AND e.event_id = o.event_id
+            RETURNING o.outbox_id, o.recipient_id, o.attempts,
+                      e.event_id, e.event_name, e.user_id, e.last_done_at, e.reminder,
+                      e.reminder_cycle_count, e.reminder_cycle_unit,
+                      e.next_reminder, e.last_notification_sent_at, e.share_count
+            """,
+            {"pending": OutboxStatus.PENDING.value, "limit": limit, "lease": lease, "lease_token": lease_token},
+        )
+        return await cur.fetchall()
+
+
+async def mark_outbox_delivered(outbox_ids: list[int], lease_token: str, conn: psycopg.AsyncConnection) -> int:
+    """
+    Mark the notifications as delivered, and stamp `last_notification_sent_at` on the events
+    whose owner was notified.
+
+    Only the notifications still leased with `lease_token` are marked, their number is returned.
+    """
+    if not outbox_ids:
+        return 0
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            WITH delivered AS (
+                UPDATE outbox
+                SET status = %(delivered)s,
+                    delivered_at = NOW(),
+                    lease_token = NULL
+                WHERE outbox_id = ANY(%(outbox_ids)s)
+                  AND lease_token = %(lease_token)s
+                RETURNING event_id, recipient_id
+            ),
+            stamped AS (
+                UPDATE events e
+                SET last_notification_sent_at = NOW()
+                FROM delivered d
+                WHERE e.event_id = d.event_id
+                  AND e.user_id = d.recipient_id
+            )
+            SELECT COUNT(*)
+            FROM delivered
+            """,
+            {"delivered": OutboxStatus.DELIVERED.value, "outbox_ids": outbox_ids, "lease_token": lease_token},
+        )
+        (marked,) = await cur.fetchone()
+    logger.info(f"Notifications delivered: {marked}")
+    if marked < len(outbox_ids):
+        logger.warning(f"Notifications delivered after their lease ran out: {len(outbox_ids) - marked}")
+    return marked
+
+
+async def mark_outbox_failed(
+    outbox_ids: list[int],
+    lease_token: str,
+    error: str,
+    max_attempts: int,
+    retry_delay: timedelta,
+    conn: psycopg.AsyncConnection,
+) -> int:
+    """
+    Count a failed attempt on the notifications, and postpone them by `retry_delay` doubled on every attempt.
+    Notifications that reached `max_attempts` are dead-lettered instead, their number is returned.
+    Only the notifications still leased with `lease_token` are marked.
+    """
+    if not outbox_ids:
+        return 0
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE outbox
+            SET attempts = attempts + 1,
+                last_error = %(error)s,
+                status = CASE WHEN attempts + 1 >= %(max_attempts)s THEN %(dead)s ELSE status END,
+                available_at = NOW() + %(retry_delay)s * POWER(2, attempts),
+                lease_token = NULL
+            WHERE outbox_id = ANY(%(outbox_ids)s)
+              AND lease_token = %(lease_token)s
+            RETURNING status
+            """,
+            {
+                "error": error,
+                "max_attempts": max_attempts,
+                "dead": OutboxStatus.DEAD.value,
+                "retry_delay": retry_delay,
+                "outbox_ids": outbox_ids,
+                "lease_token": lease_token,
+            },
+        )
+        statuses = await cur.fetchall()
+    dead = sum(1 for (status,) in statuses if status == OutboxStatus.DEAD)
+    logger.warning(f"Notifications failed: {len(statuses)}, dead-lettered: {dead}")
+    return dead
+
+
+async def release_outbox(outbox_ids: list[int], lease_token: str, conn: psycopg.AsyncConnection) -> None:
+    """
+    Give back the notifications that were claimed but not sent, they are ready to be claimed again at once.
+    No attempt is counted.
+    """
+    if not outbox_ids:
+        return
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE outbox
+            SET available_at = NOW(),
+                lease_token = NULL
+            WHERE outbox_id = ANY(%s)
+              AND lease_token = %s
+            """,
+            (outbox_ids, lease_token),
+        )
+    logger.info(f"Notifications released: {len(outbox_ids)}")
+
+
+async def purge_outbox(older_than: timedelta, conn: psycopg.AsyncConnection) -> int:
+    """
+    Delete the notifications delivered more than `older_than` ago, dead ones are kept.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            DELETE FROM outbox
+            WHERE status = %s
+              AND delivered_at < NOW() - %s
+            """,
+            (OutboxStatus.DELIVERED.value, older_than),
+        )
+        purged = cur.rowcount
+    logger.info(f"Delivered notifications purged: {purged}")
+    return purged
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+from routine_bot.constants import CHAT_CACHE_MAX_SIZE, CHAT_CACHE_TTL
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire `ttl` seconds after they were written.
+
+    Memory stays flat regardless of the number of users: once `maxsize` is reached,
+    the least recently used entry is evicted for every new one.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.evictions += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Ongoing chats keyed by user_id, written through by `async_db`.
+# A user has at most one ongoing chat, and entries are evicted once it is completed or aborted.
+chat_cache = TTLCache(maxsize=CHAT_CACHE_MAX_SIZE, ttl=CHAT_CACHE_TTL)
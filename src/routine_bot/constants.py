@@ -11,9 +11,48 @@ ENV = os.getenv("ENV")
 
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
+LINE_API_POOL_SIZE = int(os.getenv("LINE_API_POOL_SIZE", "20"))
+LINE_API_TIMEOUT = float(os.getenv("LINE_API_TIMEOUT", "10"))
+LINE_API_MAX_RETRIES = int(os.getenv("LINE_API_MAX_RETRIES", "3"))
+LINE_API_BACKOFF_BASE = float(os.getenv("LINE_API_BACKOFF_BASE", "0.5"))
+LINE_API_BACKOFF_CAP = float(os.getenv("LINE_API_BACKOFF_CAP", "30"))
+LINE_REPLY_RATE_LIMIT = float(os.getenv("LINE_REPLY_RATE_LIMIT", "2000"))
+LINE_PUSH_RATE_LIMIT = float(os.getenv("LINE_PUSH_RATE_LIMIT", "2000"))
+LINE_MULTICAST_RATE_LIMIT = float(os.getenv("LINE_MULTICAST_RATE_LIMIT", "200"))
+LINE_PROFILE_RATE_LIMIT = float(os.getenv("LINE_PROFILE_RATE_LIMIT", "2000"))
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
 REMINDER_TOKEN = os.getenv("REMINDER_TOKEN")
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_RETRY_BUDGET = int(os.getenv("REMINDER_RETRY_BUDGET", "50"))
+
+PREMIUM_SWEEP_INTERVAL = float(os.getenv("PREMIUM_SWEEP_INTERVAL", "300"))
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+SCHEDULER_MAX_CATCH_UP = int(os.getenv("SCHEDULER_MAX_CATCH_UP", "60"))
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", "60"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "300"))
+OUTBOX_RETENTION = float(os.getenv("OUTBOX_RETENTION", "604800"))
+OUTBOX_DRAIN_INTERVAL = float(os.getenv("OUTBOX_DRAIN_INTERVAL", "30"))
+
+WEBHOOK_QUEUE_MAX_SIZE = int(os.getenv("WEBHOOK_QUEUE_MAX_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+WEBHOOK_FAST_PATH = os.getenv("WEBHOOK_FAST_PATH", "false").lower() == "true"
+WEBHOOK_DEDUP_MAX_SIZE = int(os.getenv("WEBHOOK_DEDUP_MAX_SIZE", "100000"))
+WEBHOOK_DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))
+WEBHOOK_DEDUP_PURGE_INTERVAL = float(os.getenv("WEBHOOK_DEDUP_PURGE_INTERVAL", "3600"))
+
+CHAT_CACHE_MAX_SIZE = int(os.getenv("CHAT_CACHE_MAX_SIZE", "10000"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "600"))
 
 TZ_TAIPEI = ZoneInfo("Asia/Taipei")
 FREE_PLAN_MAX_EVENTS = 5
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+import psycopg
+
+import routine_bot.async_db as db
+from routine_bot.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDeduplicator:
+    """
+    Drops webhook events LINE redelivers after a slow acknowledgment, keyed on `webhookEventId`.
+
+    Recently handled IDs are answered from a bounded in-memory set, so a redelivery to the same worker
+    is dropped without touching the DB. Other IDs are claimed in the `webhook_events` table by the handler,
+    which catches redeliveries that land on another worker or after a restart.
+
+    The claim is made in the handler's own transaction, so it commits or rolls back with the writes
+    of the event. A redelivery of an event whose handling failed is handled again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.checked = 0
+        self.dropped = 0
+
+    def is_duplicate(self, webhook_event_id: str) -> bool:
+        """
+        Whether the event was recently handled by this worker.
+        """
+        self.checked += 1
+        if self._seen.get(webhook_event_id) is not None:
+            self.dropped += 1
+            return True
+        return False
+
+    async def claim(self, webhook_event_id: str, conn: psycopg.AsyncConnection) -> bool:
+        """
+        Record the event in the caller's transaction, return False if it was already handled.
+        Waits for a concurrent claim of the same event to commit or roll back.
+        """
+        if await db.claim_webhook_event(webhook_event_id, conn):
+            return True
+        self.dropped += 1
+        self._seen.set(webhook_event_id, True)
+        return False
+
+    def remember(self, webhook_event_id: str) -> None:
+        """
+        Mark the event as handled, once its claim is committed.
+        """
+        self._seen.set(webhook_event_id, True)
+
+    async def purge_periodically(self, interval: float) -> None:
+        """
+        Delete the recorded IDs older than the TTL every `interval` seconds, until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with db.pool.connection() as conn:
+                    await db.purge_webhook_events(timedelta(seconds=self.ttl), conn)
+            except Exception:
+                logger.warning("Failed to purge webhook events", exc_info=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "checked": self.checked,
+            "dropped": self.dropped,
+            "seen_size": len(self._seen),
+        }
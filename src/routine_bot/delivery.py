@@ -0,0 +1,105 @@
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from linebot.v3.messaging import Message
+
+from routine_bot.line_client import LineClient
+from routine_bot.ratelimit import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+# Limits of the Messaging API for a single push / multicast request.
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_MULTICAST_RECIPIENTS = 500
+
+
+@dataclass
+class DeliveryOutcome:
+    recipient_id: str
+    key: str
+    delivered: bool
+    error: str | None = None
+    # the request was not sent because the deadline had passed
+    skipped: bool = False
+
+
+class DeliveryBatch:
+    """
+    Collects the messages to send and delivers them in as few API calls as possible.
+
+    Messages are identified by a `key`, e.g. the event ID, and the same message can be added for
+    several recipients. The messages of each recipient are packed into requests of up to 5, then the
+    recipients whose requests are identical are sent together in multicasts of up to 500 user IDs.
+    A single recipient is sent with a push instead.
+    """
+
+    def __init__(self):
+        self._messages: dict[str, Message] = {}
+        self._keys_by_recipient: dict[str, list[str]] = defaultdict(list)
+        self.api_calls = 0
+
+    def __len__(self) -> int:
+        return len(self._keys_by_recipient)
+
+    def add(self, key: str, message: Message, recipient_ids: list[str]) -> None:
+        self._messages[key] = message
+        for recipient_id in recipient_ids:
+            if key not in self._keys_by_recipient[recipient_id]:
+                self._keys_by_recipient[recipient_id].append(key)
+
+    def _plan(self) -> dict[tuple[str, ...], list[str]]:
+        """
+        Group the recipients by the keys of the messages in each request.
+        """
+        recipients_by_request: dict[tuple[str, ...], list[str]] = defaultdict(list)
+        for recipient_id, keys in self._keys_by_recipient.items():
+            # sorted, so that recipients of the same messages end up with identical requests
+            keys = sorted(keys)
+            for i in range(0, len(keys), MAX_MESSAGES_PER_REQUEST):
+                recipients_by_request[tuple(keys[i : i + MAX_MESSAGES_PER_REQUEST])].append(recipient_id)
+        return recipients_by_request
+
+    async def send(
+        self,
+        client: LineClient,
+        budget: RetryBudget | None = None,
+        deadline: float | None = None,
+        retry_key: Callable[[tuple[str, ...], list[str]], str] | None = None,
+    ) -> list[DeliveryOutcome]:
+        """
+        Send every request and report whether each message reached each recipient.
+
+        A failed request fails all of its recipients, and does not stop the remaining requests.
+        Retries of all the requests are drawn from the same `budget`.
+        No request is started after the `deadline`, a `time.monotonic()` value, its recipients are skipped.
+        `retry_key` gives the `X-Line-Retry-Key` of the request for the message keys and the recipients,
+        a random one is used by default.
+        """
+        outcomes = []
+        for keys, recipient_ids in self._plan().items():
+            messages = [self._messages[key] for key in keys]
+            for i in range(0, len(recipient_ids), MAX_MULTICAST_RECIPIENTS):
+                chunk = recipient_ids[i : i + MAX_MULTICAST_RECIPIENTS]
+                if deadline is not None and time.monotonic() > deadline:
+                    outcomes.extend(
+                        DeliveryOutcome(recipient_id, key, False, skipped=True) for recipient_id in chunk for key in keys
+                    )
+                    continue
+                key = retry_key(keys, chunk) if retry_key is not None else None
+                self.api_calls += 1
+                try:
+                    if len(chunk) == 1:
+                        await client.push(chunk[0], messages, budget=budget, retry_key=key)
+                    else:
+                        await client.multicast(chunk, messages, budget=budget, retry_key=key)
+                    delivered, error = True, None
+                except Exception as e:
+                    logger.warning(f"Failed to deliver {len(messages)} messages to {len(chunk)} users", exc_info=True)
+                    delivered, error = False, repr(e)
+                outcomes.extend(
+                    DeliveryOutcome(recipient_id, key, delivered, error) for recipient_id in chunk for key in keys
+                )
+        return outcomes
@@ -0,0 +1,22 @@
+import asyncio
+import logging
+
+import routine_bot.async_db as db
+
+logger = logging.getLogger(__name__)
+
+
+async def sweep_periodically(interval: float) -> None:
+    """
+    Update the limits of the users whose premium access changed every `interval` seconds, until cancelled.
+
+    Event count changes keep `users.is_limited` up to date on their own. Premium access expires without
+    any write, and is granted outside of the bot, so both are picked up here, at most `interval` seconds late.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with db.pool.connection() as conn:
+                await db.refresh_premium_limits(conn)
+        except Exception:
+            logger.warning("Failed to sweep premium users", exc_info=True)
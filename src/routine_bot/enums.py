@@ -57,3 +57,12 @@ class NewEventSteps(StrEnum):
 
 class FindEventSteps(StrEnum):
     INPUT_NAME = auto()
+
+
+# ------------------------------- Outbox Enums ------------------------------- #
+
+
+class OutboxStatus(StrEnum):
+    PENDING = auto()
+    DELIVERED = auto()
+    DEAD = auto()
@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.webhooks import (
+    Event,
+    FollowEvent,
+    MessageEvent,
+    PostbackEvent,
+    TextMessageContent,
+    UnfollowEvent,
+)
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+@dataclass(slots=True, frozen=True)
+class FastSource:
+    user_id: str | None
+
+
+@dataclass(slots=True, frozen=True)
+class FastTextMessage:
+    text: str
+
+
+@dataclass(slots=True, frozen=True)
+class FastPostback:
+    data: str
+    params: dict[str, str] | None
+
+
+@dataclass(slots=True, frozen=True)
+class FastEvent:
+    """
+    Lightweight stand-in for an SDK webhook event, carrying only the fields our handlers read.
+
+    `handler_key` is the `(event class, message class)` the event would have been registered under
+    with the SDK models, so it is dispatched to the same handler.
+    """
+
+    handler_key: tuple[type, type | None]
+    type: str
+    webhook_event_id: str
+    source: FastSource
+    reply_token: str | None = None
+    message: FastTextMessage | None = None
+    postback: FastPostback | None = None
+
+
+def parse_fast_event(raw: dict) -> FastEvent | None:
+    """
+    Build a `FastEvent` for the event types with a fast path, `None` for any other one.
+    """
+    event_type = raw.get("type")
+    common = {
+        "type": event_type,
+        "webhook_event_id": raw["webhookEventId"],
+        "source": FastSource(user_id=raw.get("source", {}).get("userId")),
+        "reply_token": raw.get("replyToken"),
+    }
+    if event_type == "message":
+        message = raw.get("message", {})
+        if message.get("type") != "text":
+            return None
+        return FastEvent(
+            handler_key=(MessageEvent, TextMessageContent), message=FastTextMessage(text=message["text"]), **common
+        )
+    if event_type == "postback":
+        postback = raw["postback"]
+        return FastEvent(
+            handler_key=(PostbackEvent, None),
+            postback=FastPostback(data=postback["data"], params=postback.get("params")),
+            **common,
+        )
+    if event_type == "follow":
+        return FastEvent(handler_key=(FollowEvent, None), **common)
+    if event_type == "unfollow":
+        return FastEvent(handler_key=(UnfollowEvent, None), **common)
+    return None
+
+
+class FastWebhookParser:
+    """
+    Webhook parser that skips the SDK's pydantic models for the events we handle.
+
+    The signature is verified on the raw bytes and the body is decoded with `orjson` when it is
+    installed. Text messages, postbacks, follows and unfollows become `FastEvent`s, and every other
+    event falls back to the SDK model.
+    """
+
+    def __init__(self, channel_secret: str):
+        self.channel_secret = channel_secret.encode("utf-8")
+
+    def verify(self, body: bytes, signature: str) -> None:
+        digest = hmac.new(self.channel_secret, body, hashlib.sha256).digest()
+        if not hmac.compare_digest(base64.b64encode(digest), signature.encode("utf-8")):
+            raise InvalidSignatureError(f"Invalid signature. signature={signature}")
+
+    def parse(self, body: bytes, signature: str) -> list[Event | FastEvent]:
+        self.verify(body, signature)
+        events = []
+        for raw in json_loads(body).get("events", []):
+            event = parse_fast_event(raw)
+            events.append(event if event is not None else Event.from_dict(raw))
+        return events
@@ -5,43 +5,37 @@ import uuid
 from datetime import datetime
 
 import psycopg
-import requests
-from dateutil.relativedelta import relativedelta
-from linebot.v3 import WebhookHandler
-from linebot.v3.messaging import (
-    ApiClient,
-    Configuration,
-    Message,
-    MessagingApi,
-    ReplyMessageRequest,
-    TextMessage,
-)
+from linebot.v3.messaging import Message, TextMessage
 from linebot.v3.webhooks import FollowEvent, MessageEvent, PostbackEvent, TextMessageContent, UnfollowEvent
 
-import routine_bot.db as db
+import routine_bot.async_db as db
+from routine_bot.cache import chat_cache
 from routine_bot.constants import (
-    DATABASE_URL,
-    LINE_CHANNEL_ACCESS_TOKEN,
     LINE_CHANNEL_SECRET,
     TZ_TAIPEI,
+    WEBHOOK_DEDUP_MAX_SIZE,
+    WEBHOOK_DEDUP_TTL,
+    WEBHOOK_FAST_PATH,
 )
+from routine_bot.dedup import WebhookDeduplicator
 from routine_bot.enums import (
     SUPPORTED_COMMANDS,
-    SUPPORTED_UNITS,
     ChatStatus,
     ChatType,
     Command,
-    CycleUnit,
     FindEventSteps,
     NewEventSteps,
 )
+from routine_bot.line_client import line_client
 from routine_bot.messages import AbortMsg, ErrorMsg, FindEventMsg, GreetingMsg, NewEventMsg
 from routine_bot.models import ChatData, EventData, UpdateData, UserData
+from routine_bot.recurrence import add_cycles, parse_cycle
+from routine_bot.webhook import AsyncWebhookHandler
 
 logger = logging.getLogger(__name__)
 
-configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
-handler = WebhookHandler(LINE_CHANNEL_SECRET)
+webhook_deduplicator = WebhookDeduplicator(maxsize=WEBHOOK_DEDUP_MAX_SIZE, ttl=WEBHOOK_DEDUP_TTL)
+handler = AsyncWebhookHandler(LINE_CHANNEL_SECRET, deduplicator=webhook_deduplicator, fast_path=WEBHOOK_FAST_PATH)
 
 
 # ------------------------------ Util Functions ------------------------------ #
@@ -83,24 +77,10 @@ def validate_event_name(event_name: str) -> str | None:
     return None
 
 
-def parse_reminder_cycle(msg: str) -> tuple[int, str] | None:
-    try:
-        value, unit = msg.split(" ", maxsplit=1)
-    except ValueError:
-        return None
-    try:
-        value = int(value)
-    except ValueError:
-        return None
-    if unit not in SUPPORTED_UNITS:
-        return None
-    return value, unit
-
-
 # ------------------------------ Chat Handlers ------------------------------- #
 
 
-def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) -> Message:
+async def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.AsyncConnection) -> Message:
     if chat.current_step == NewEventSteps.INPUT_NAME:
         logger.debug("Processing event name input")
         event_name = msg
@@ -110,16 +90,16 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
         if error_msg is not None:
             logger.debug(f"Invalid event name input: {event_name}")
             return TextMessage(text=error_msg)
-        if db.get_event_id(chat.user_id, event_name, conn) is not None:
+        if await db.get_event_by_name(chat.user_id, event_name, conn) is not None:
             logger.debug(f"Duplicated event name input: {event_name}")
             return ErrorMsg.event_name_duplicated(event_name)
 
         chat.payload["event_name"] = event_name
         chat.payload["chat_id"] = chat.chat_id
+        chat.current_step = NewEventSteps.INPUT_START_DATE.value
         logger.info(f"Added to chat payload: event_name='{event_name}'")
         logger.info(f"Added to chat payload: chat_id='{chat.chat_id}'")
-        db.set_chat_payload(chat.chat_id, chat.payload, conn)
-        db.set_chat_current_step(chat.chat_id, NewEventSteps.INPUT_START_DATE.value, conn)
+        await db.set_chat_state(chat, conn)
         return NewEventMsg.prompt_for_start_date(chat.payload)
 
     elif chat.current_step == NewEventSteps.INPUT_START_DATE:
@@ -130,16 +110,15 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
         logger.info("Processing toggle reminder input")
         if msg == "設定提醒":
             chat.payload["reminder"] = True
+            chat.current_step = NewEventSteps.INPUT_REMINDER_CYCLE.value
             logger.info("Added to chat payload: reminder=True")
-            db.set_chat_payload(chat.chat_id, chat.payload, conn)
-            db.set_chat_current_step(chat.chat_id, NewEventSteps.INPUT_REMINDER_CYCLE.value, conn)
+            await db.set_chat_state(chat, conn)
             return NewEventMsg.prompt_for_reminder_cycle(chat.payload)
         elif msg == "不設定提醒":
             chat.payload["reminder"] = False
+            chat.current_step = None
+            chat.status = ChatStatus.COMPLETED.value
             logger.info("Added to chat payload: reminder=False")
-            db.set_chat_current_step(chat.chat_id, None, conn)
-            db.set_chat_status(chat.chat_id, ChatStatus.COMPLETED.value, conn)
-            logger.info(f"Chat completed: {chat.chat_id}")
 
             event_id = str(uuid.uuid4())
             event = EventData(
@@ -149,7 +128,6 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
                 last_done_at=datetime.fromisoformat(chat.payload["start_date"]),
                 reminder=False,
             )
-            db.add_event(event, conn)
             update = UpdateData(
                 update_id=str(uuid.uuid4()),
                 event_id=event_id,
@@ -157,8 +135,12 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
                 user_id=chat.user_id,
                 done_at=datetime.fromisoformat(chat.payload["start_date"]),
             )
-            db.add_update(update, conn)
-            db.increment_user_event_count(chat.user_id, by=1, conn=conn)
+            async with db.unit_of_work(conn):
+                await db.set_chat_state(chat, conn)
+                await db.add_event(event, conn)
+                await db.add_update(update, conn)
+                await db.increment_user_event_count(chat.user_id, by=1, conn=conn)
+            logger.info(f"Chat completed: {chat.chat_id}")
             return NewEventMsg.event_created_no_reminder(chat.payload)
         else:
             logger.debug(f"Invalid reminder input: {msg}")
@@ -169,26 +151,17 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
         if msg.lower() == "example":
             logger.info("Return reminder cycle example")
             return NewEventMsg.reminder_cycle_example()
-        if parse_reminder_cycle(msg) is None:
+        if parse_cycle(msg) is None:
             logger.info(f"Invalid reminder cycle input: {msg}")
             return NewEventMsg.invalid_input_for_reminder_cycle(chat.payload)
         chat.payload["reminder_cycle"] = msg
-        increment, unit = parse_reminder_cycle(msg)
+        chat.current_step = None
+        chat.status = ChatStatus.COMPLETED.value
+        cycle_count, cycle_unit = parse_cycle(msg)
         start_date = datetime.fromisoformat(chat.payload["start_date"])
-
-        if unit == CycleUnit.DAY:
-            offset = relativedelta(days=+increment)
-        elif unit == CycleUnit.WEEK:
-            offset = relativedelta(weeks=+increment)
-        elif unit == CycleUnit.MONTH:
-            offset = relativedelta(months=+increment)
-        next_reminder = start_date + offset
+        next_reminder = add_cycles(start_date, cycle_count, cycle_unit)
         logger.info(f"Added to chat payload: reminder_cycle='{chat.payload['reminder_cycle']}'")
         logger.info(f"Next reminder: {next_reminder.strftime('%Y-%m-%d')}")
-        db.set_chat_payload(chat.payload, None, conn)
-        db.set_chat_current_step(chat.chat_id, None, conn)
-        db.set_chat_status(chat.chat_id, ChatStatus.COMPLETED.value, conn)
-        logger.info(f"Chat completed: {chat.chat_id}")
 
         event_id = str(uuid.uuid4())
         event = EventData(
@@ -197,10 +170,10 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
             user_id=chat.user_id,
             last_done_at=datetime.fromisoformat(chat.payload["start_date"]),
             reminder=True,
-            reminder_cycle=chat.payload["reminder_cycle"],
+            reminder_cycle_count=cycle_count,
+            reminder_cycle_unit=cycle_unit.value,
             next_reminder=next_reminder,
         )
-        db.add_event(event, conn)
         update = UpdateData(
             update_id=str(uuid.uuid4()),
             event_id=event_id,
@@ -208,12 +181,16 @@ def handle_new_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection) ->
             user_id=chat.user_id,
             done_at=datetime.fromisoformat(chat.payload["start_date"]),
         )
-        db.add_update(update, conn)
-        db.increment_user_event_count(chat.user_id, by=1, conn=conn)
+        async with db.unit_of_work(conn):
+            await db.set_chat_state(chat, conn)
+            await db.add_event(event, conn)
+            await db.add_update(update, conn)
+            await db.increment_user_event_count(chat.user_id, by=1, conn=conn)
+        logger.info(f"Chat completed: {chat.chat_id}")
         return NewEventMsg.event_created_with_reminder(chat.payload)
 
 
-def handle_find_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection):
+async def handle_find_event_chat(msg: str, chat: ChatData, conn: psycopg.AsyncConnection):
     if chat.current_step == FindEventSteps.INPUT_NAME:
         logger.info("Processing event name input")
         event_name = msg
@@ -222,25 +199,25 @@ def handle_find_event_chat(msg: str, chat: ChatData, conn: psycopg.Connection):
         if error_msg is not None:
             logger.info(f"Invalid event name input: {event_name}")
             return error_msg
-        event_id = db.get_event_id(chat.user_id, event_name, conn)
-        if event_id is None:
+        event = await db.get_event_by_name(chat.user_id, event_name, conn)
+        if event is None:
             logger.info(f"Event name not found: {event_name}")
             return ErrorMsg.event_name_not_found(event_name)
 
         logger.info(f"Event name input: {event_name}")
-        logger.info(f"Event found: {event_id}")
-        event = db.get_event(event_id, conn)
-        recent_update_times = db.get_event_recent_update_times(event_id, conn)
-        db.set_chat_current_step(chat.chat_id, None, conn)
-        db.set_chat_status(chat.chat_id, ChatStatus.COMPLETED.value, conn)
+        logger.info(f"Event found: {event.event_id}")
+        recent_update_times = await db.get_event_recent_update_times(event.event_id, conn)
+        chat.current_step = None
+        chat.status = ChatStatus.COMPLETED.value
+        await db.set_chat_state(chat, conn)
         logger.info(f"Chat completed: {chat.chat_id}")
         return FindEventMsg.format_event_summary(event, recent_update_times)
 
 
-def create_new_chat(command: str, user_id: str, conn: psycopg.Connection) -> str:
+async def create_new_chat(command: str, user_id: str, conn: psycopg.AsyncConnection) -> str:
     chat_id = str(uuid.uuid4())
     if command == Command.NEW:
-        user = db.get_user(user_id, conn)
+        user = await db.get_user(user_id, conn)
         if user.is_limited:
             logger.info("Failed to create new event: reached max events allowed")
             return ErrorMsg.max_events_reached()
@@ -251,7 +228,7 @@ def create_new_chat(command: str, user_id: str, conn: psycopg.Connection) -> str
             chat_type=ChatType.NEW_EVENT.value,
             current_step=NewEventSteps.INPUT_NAME.value,
         )
-        db.add_chat(chat, conn)
+        await db.add_chat(chat, conn)
         return NewEventMsg().prompt_for_event_name()
     if command == Command.FIND:
         logger.info("Creating new chat, chat type: find event")
@@ -261,123 +238,166 @@ def create_new_chat(command: str, user_id: str, conn: psycopg.Connection) -> str
             chat_type=ChatType.FIND_EVENT.value,
             current_step=FindEventSteps.INPUT_NAME.value,
         )
-        db.add_chat(chat, conn)
+        await db.add_chat(chat, conn)
         return FindEventMsg.prompt_for_event_name()
 
 
-def handle_ongoing_chat(msg: str, chat: ChatData, conn: psycopg.Connection) -> str:
+async def handle_ongoing_chat(msg: str, chat: ChatData, conn: psycopg.AsyncConnection) -> str:
     if chat.chat_type == ChatType.NEW_EVENT:
-        return handle_new_event_chat(msg, chat, conn)
+        return await handle_new_event_chat(msg, chat, conn)
     if chat.chat_type == ChatType.FIND_EVENT:
-        return handle_find_event_chat(msg, chat, conn)
+        return await handle_find_event_chat(msg, chat, conn)
 
 
-def get_reply_message_from_text(msg: str, user_id: str) -> Message:
-    logger.debug(f"Message received: {msg}")
-    with psycopg.connect(conninfo=DATABASE_URL) as conn:
-        ongoing_chat_id = db.get_ongoing_chat_id(user_id, conn)
-
-        if ongoing_chat_id is None:
-            if msg == Command.ABORT:
-                return AbortMsg.no_ongoing_chat()
-            if not msg.startswith("/"):
-                return GreetingMsg.random()
-            if msg not in SUPPORTED_COMMANDS:
-                return ErrorMsg.unrecognized_command()
-            return create_new_chat(msg, user_id, conn)
-
-        chat = db.get_chat(ongoing_chat_id, conn)
-        logger.debug(f"Ongoing chat found: {chat.chat_id}")
-        logger.debug(f"Chat type: {chat.chat_type}")
-        logger.debug(f"Current step: {chat.current_step}")
+async def reply_to_text(msg: str, user_id: str, conn: psycopg.AsyncConnection) -> Message:
+    chat = await db.get_ongoing_chat(user_id, conn)
 
+    if chat is None:
         if msg == Command.ABORT:
-            chat.status = ChatStatus.ABORTED.value
-            db.set_chat_status(chat.chat_id, ChatStatus.ABORTED.value, conn)
-            logger.info(f"Chat aborted: {chat.chat_id}")
-            return AbortMsg.ongoing_chat_aborted()
+            return AbortMsg.no_ongoing_chat()
+        if not msg.startswith("/"):
+            return GreetingMsg.random()
+        if msg not in SUPPORTED_COMMANDS:
+            return ErrorMsg.unrecognized_command()
+        return await create_new_chat(msg, user_id, conn)
+
+    logger.debug(f"Ongoing chat found: {chat.chat_id}")
+    logger.debug(f"Chat type: {chat.chat_type}")
+    logger.debug(f"Current step: {chat.current_step}")
+
+    if msg == Command.ABORT:
+        chat.status = ChatStatus.ABORTED.value
+        await db.set_chat_state(chat, conn)
+        logger.info(f"Chat aborted: {chat.chat_id}")
+        return AbortMsg.ongoing_chat_aborted()
+
+    return await handle_ongoing_chat(msg, chat, conn)
+
 
-        return handle_ongoing_chat(msg, chat, conn)
+async def reply_to_postback(event: PostbackEvent, conn: psycopg.AsyncConnection) -> Message | None:
+    chat_id = event.postback.data
+    chat = await db.get_ongoing_chat(event.source.user_id, conn)
+    if chat is None or chat.chat_id != chat_id:
+        logger.info(f"Postback for a chat that is no longer ongoing: {chat_id}")
+        return None
+    # only proceed if status and current step matches
+    if chat.chat_type == ChatType.NEW_EVENT and chat.current_step == NewEventSteps.INPUT_START_DATE:
+        logger.info("Processing start date input")
+        start_date = datetime.strptime(event.postback.params["date"], "%Y-%m-%d")
+        start_date = start_date.replace(tzinfo=TZ_TAIPEI)
+        chat.payload["start_date"] = start_date.isoformat()  # datetime is not JSON serializable
+        chat.current_step = NewEventSteps.INPUT_TOGGLE_REMINDER.value
+        logger.info(f"Added to chat payload: start_date='{chat.payload['start_date']}'")
+        await db.set_chat_state(chat, conn)
+        return NewEventMsg.prompt_for_toggle_reminder(chat.payload)
+    return None
+
+
+async def claim_event(webhook_event_id: str | None, conn: psycopg.AsyncConnection) -> bool:
+    """
+    Claim the webhook event in the transaction of its handler, return False if it was already handled.
+    Without a `webhook_event_id`, the message did not come through the webhook and there is nothing to claim.
+    """
+    if webhook_event_id is None:
+        return True
+    if await webhook_deduplicator.claim(webhook_event_id, conn):
+        return True
+    logger.info(f"Duplicate webhook event dropped: {webhook_event_id}")
+    return False
+
+
+async def get_reply_message_from_text(msg: str, user_id: str, webhook_event_id: str | None = None) -> Message | None:
+    logger.debug(f"Message received: {msg}")
+    async with db.pool.connection() as conn:
+        await db.lock_user(user_id, conn)
+        if not await claim_event(webhook_event_id, conn):
+            return None
+        try:
+            return await reply_to_text(msg, user_id, conn)
+        except db.StaleChatError:
+            # another worker wrote the chat before its invalidation arrived,
+            # the user lock is held so the stored chat is the latest one
+            logger.info(f"Cached chat is stale, retrying on the stored one: {user_id}")
+            chat_cache.evict(user_id)
+            return await reply_to_text(msg, user_id, conn)
+
+
+async def get_reply_message_from_postback(event: PostbackEvent) -> Message | None:
+    async with db.pool.connection() as conn:
+        await db.lock_user(event.source.user_id, conn)
+        if not await claim_event(event.webhook_event_id, conn):
+            return None
+        try:
+            return await reply_to_postback(event, conn)
+        except db.StaleChatError:
+            logger.info(f"Cached chat is stale, retrying on the stored one: {event.source.user_id}")
+            chat_cache.evict(event.source.user_id)
+            return await reply_to_postback(event, conn)
 
 
 # --------------------------- LINE Event Handlers ---------------------------- #
 
 
 @handler.add(FollowEvent)
-def handle_user_added(event: FollowEvent) -> None:
+async def handle_user_added(event: FollowEvent) -> None:
     user_id = event.source.user_id
+    # fetched before checking out a connection, so none is held during the API call
+    profile = await line_client.get_profile(user_id)
 
-    with psycopg.connect(conninfo=DATABASE_URL) as conn:
-        if not db.is_user_exists(user_id, conn):
-            resp = requests.get(
-                f"https://api.line.me/v2/bot/profile/{user_id}",
-                headers={"Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}"},
-            )
-            user_info = resp.json()
-            display_name = user_info.get("displayName")
-            picture_url = user_info.get("pictureUrl")
-            logger.info(f"Added by: {user_id}")
-            logger.info(f"Display name: {display_name}")
-            db.add_user(user_id, display_name, picture_url, conn)
-        else:
+    async with db.pool.connection() as conn:
+        if not await claim_event(event.webhook_event_id, conn):
+            return None
+        if await db.set_user_activeness(user_id, True, conn):
             logger.info(f"Unblocked by: {user_id}")
-            db.set_user_activeness(user_id, True, conn)
-            events = db.get_all_events_by_user(user_id, conn)
-            for event_id in events:
-                db.set_event_activeness(event_id, True, conn)
-
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        line_bot_api.reply_message(
-            ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="hello my new friend!")])
-        )
+            await db.set_user_profile(user_id, profile.display_name, profile.picture_url, conn)
+        else:
+            logger.info(f"Added by: {user_id}")
+            logger.info(f"Display name: {profile.display_name}")
+            await db.add_user(user_id, profile.display_name, profile.picture_url, conn)
+
+    await line_client.reply(event.reply_token, [TextMessage(text="hello my new friend!")])
 
 
 @handler.add(UnfollowEvent)
-def handle_user_blocked(event: UnfollowEvent) -> None:
+async def handle_user_blocked(event: UnfollowEvent) -> None:
     user_id = event.source.user_id
 
-    with psycopg.connect(conninfo=DATABASE_URL) as conn:
-        if not db.is_user_exists(user_id, conn):
+    async with db.pool.connection() as conn:
+        if not await claim_event(event.webhook_event_id, conn):
+            return None
+        if not await db.set_user_activeness(user_id, False, conn):
             logger.warning(f"Blocked by user not found in database: {user_id}")
         else:
             logger.info(f"Blocked by: {user_id}")
-            db.set_user_activeness(user_id, False, conn)
-            events = db.get_all_events_by_user(user_id, conn)
-            for event_id in events:
-                db.set_event_activeness(event_id, False, conn)
 
 
 @handler.add(PostbackEvent)
-def handle_postback(event: PostbackEvent):
+async def handle_postback(event: PostbackEvent):
     logger.info(f"Postback data: {event.postback.data}")
     logger.info(f"Postback params: {event.postback.params}")
-    chat_id = event.postback.data
-    with psycopg.connect(conninfo=DATABASE_URL) as conn:
-        chat = db.get_chat(chat_id, conn)
-        # only proceed if status and current step matches
-        if chat.chat_type == ChatType.NEW_EVENT and chat.current_step == NewEventSteps.INPUT_START_DATE:
-            logger.info("Processing start date input")
-            start_date = datetime.strptime(event.postback.params["date"], "%Y-%m-%d")
-            start_date = start_date.replace(tzinfo=TZ_TAIPEI)
-            chat.payload["start_date"] = start_date.isoformat()  # datetime is not JSON serializable
-            chat.current_step = NewEventSteps.INPUT_TOGGLE_REMINDER
-            logger.info(f"Added to chat payload: start_date='{chat.payload['start_date']}'")
-            db.set_chat_payload(chat.chat_id, chat.payload, conn)
-            db.set_chat_current_step(chat.chat_id, NewEventSteps.INPUT_TOGGLE_REMINDER.value, conn)
-            reply_message = NewEventMsg.prompt_for_toggle_reminder(chat.payload)
-        else:
-            return None
+    try:
+        reply_message = await get_reply_message_from_postback(event)
+    except Exception:
+        # the cached chat may be ahead of the rolled back transaction
+        chat_cache.evict(event.source.user_id)
+        raise
+    if reply_message is None:
+        return None
 
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        line_bot_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[reply_message]))
+    await line_client.reply(event.reply_token, [reply_message])
 
 
 @handler.add(MessageEvent, message=TextMessageContent)
-def handle_text_message(event: MessageEvent) -> None:
+async def handle_text_message(event: MessageEvent) -> None:
     msg = sanitize_msg(event.message.text)
-    reply_message = get_reply_message_from_text(msg=msg, user_id=event.source.user_id)
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        line_bot_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[reply_message]))
+    try:
+        reply_message = await get_reply_message_from_text(
+            msg=msg, user_id=event.source.user_id, webhook_event_id=event.webhook_event_id
+        )
+    except Exception:
+        # the cached chat may be ahead of the rolled back transaction
+        chat_cache.evict(event.source.user_id)
+        raise
+    if reply_message is None:
+        return None
+    await line_client.reply(event.reply_token, [reply_message])
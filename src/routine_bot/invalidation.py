@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import uuid
+
+import psycopg
+
+from routine_bot.cache import TTLCache, chat_cache
+from routine_bot.constants import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "routine_bot_invalidation"
+
+# Identifies the notifications sent by this worker, which already holds the fresh entry.
+WORKER_ID = uuid.uuid4().hex
+
+# Entity type carried in the notification payload -> in-process cache to evict from.
+CACHES: dict[str, TTLCache] = {
+    "chat": chat_cache,
+}
+
+
+def format_payload(entity: str, key: str) -> str:
+    return f"{WORKER_ID}:{entity}:{key}"
+
+
+def apply_payload(payload: str) -> None:
+    origin, entity, key = payload.split(":", maxsplit=2)
+    if origin == WORKER_ID:
+        return
+    cache = CACHES.get(entity)
+    if cache is None:
+        logger.warning(f"Invalidation for unknown entity: {entity}")
+        return
+    cache.evict(key)
+    logger.debug(f"Cache entry invalidated: {entity}:{key}")
+
+
+async def listen(reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0) -> None:
+    """
+    Evict cache entries written by other workers, until cancelled.
+
+    `NOTIFY` is transactional, so a notification only arrives once the write is committed.
+    Notifications sent while the listener is disconnected are lost, so the caches are cleared
+    on every (re)connect.
+    """
+    delay = reconnect_delay
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(conninfo=DATABASE_URL, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                for cache in CACHES.values():
+                    cache.clear()
+                logger.info(f"Listening for cache invalidations: {CHANNEL}")
+                delay = reconnect_delay
+                async for notify in conn.notifies():
+                    apply_payload(notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning(f"Invalidation listener disconnected, retrying in {delay:.0f}s", exc_info=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_reconnect_delay)
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from linebot.v3.messaging import (
+    ApiException,
+    AsyncApiClient,
+    AsyncMessagingApi,
+    Configuration,
+    Message,
+    MulticastRequest,
+    PushMessageRequest,
+    ReplyMessageRequest,
+    UserProfileResponse,
+)
+
+from routine_bot.constants import (
+    LINE_API_BACKOFF_BASE,
+    LINE_API_BACKOFF_CAP,
+    LINE_API_MAX_RETRIES,
+    LINE_API_POOL_SIZE,
+    LINE_API_TIMEOUT,
+    LINE_CHANNEL_ACCESS_TOKEN,
+    LINE_MULTICAST_RATE_LIMIT,
+    LINE_PROFILE_RATE_LIMIT,
+    LINE_PUSH_RATE_LIMIT,
+    LINE_REPLY_RATE_LIMIT,
+)
+from routine_bot.metrics import LatencyHistogram
+from routine_bot.ratelimit import RetryBudget, TokenBucket, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ("reply", "push", "multicast", "profile")
+
+# Requests per second allowed on each endpoint.
+RATE_LIMITS = {
+    "reply": LINE_REPLY_RATE_LIMIT,
+    "push": LINE_PUSH_RATE_LIMIT,
+    "multicast": LINE_MULTICAST_RATE_LIMIT,
+    "profile": LINE_PROFILE_RATE_LIMIT,
+}
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, ApiException):
+        return e.status == 429 or (e.status is not None and e.status >= 500)
+    return isinstance(e, TimeoutError)
+
+
+def is_accepted_replay(e: Exception) -> bool:
+    """
+    Whether a push or multicast was refused because a request with the same retry key was already accepted.
+    """
+    return isinstance(e, ApiException) and e.status == 409 and "x-line-accepted-request-id" in (e.headers or {})
+
+
+def get_retry_after(e: Exception) -> float | None:
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return float(headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class LineClient:
+    """
+    One long-lived LINE Messaging API client shared by the handlers and the reminder runner.
+
+    The underlying `aiohttp` session keeps its connections alive between calls, up to `pool_size`
+    of them, so the outbound calls skip the TCP and TLS handshakes once the pool is warm.
+    Opened and closed by the app lifespan.
+
+    Every endpoint has its own token bucket. Calls rejected with 429 or 5xx, or timed out, are retried
+    with jittered exponential backoff that honors `Retry-After`, up to `max_retries` times per call and
+    within the optional `RetryBudget` shared by a batch of calls. Push and multicast retries carry
+    the same `X-Line-Retry-Key`, so LINE does not deliver a message twice. A caller replaying a request,
+    e.g. after a crash, can pass the key of the first attempt, the replay then succeeds without a delivery.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        pool_size: int,
+        timeout: float,
+        rate_limits: dict[str, float],
+        max_retries: int,
+        backoff_base: float,
+        backoff_cap: float,
+    ):
+        self.configuration = Configuration(access_token=access_token)
+        self.configuration.connection_pool_maxsize = pool_size
+        self.timeout = timeout
+        self.buckets = {endpoint: TokenBucket(rate_limits[endpoint]) for endpoint in ENDPOINTS}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._api_client: AsyncApiClient | None = None
+        self._api: AsyncMessagingApi | None = None
+        self.latency = {endpoint: LatencyHistogram() for endpoint in ENDPOINTS}
+        self.errors = dict.fromkeys(ENDPOINTS, 0)
+        self.retries = dict.fromkeys(ENDPOINTS, 0)
+        self.limiter_wait_seconds = dict.fromkeys(ENDPOINTS, 0.0)
+        self.backoff_seconds = dict.fromkeys(ENDPOINTS, 0.0)
+        self.network_seconds = dict.fromkeys(ENDPOINTS, 0.0)
+
+    async def open(self) -> None:
+        self._api_client = AsyncApiClient(self.configuration)
+        self._api = AsyncMessagingApi(self._api_client)
+        logger.info(f"LINE API client opened: pool size {self.configuration.connection_pool_maxsize}")
+
+    async def close(self) -> None:
+        if self._api_client is not None:
+            await self._api_client.close()
+            self._api_client = None
+            self._api = None
+            logger.info("LINE API client closed")
+
+    @property
+    def api(self) -> AsyncMessagingApi:
+        if self._api is None:
+            raise RuntimeError("LINE API client is not opened")
+        return self._api
+
+    async def _call(self, endpoint: str, method, *args, budget: RetryBudget | None = None, **kwargs):
+        attempt = 0
+        while True:
+            self.limiter_wait_seconds[endpoint] += await self.buckets[endpoint].acquire()
+            started_at = time.perf_counter()
+            try:
+                return await method(*args, **kwargs, _request_timeout=self.timeout)
+            except Exception as e:
+                retry = is_retryable(e) and attempt < self.max_retries and (budget is None or budget.try_spend())
+                if not retry:
+                    if not is_accepted_replay(e):
+                        self.errors[endpoint] += 1
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, get_retry_after(e))
+                logger.info(f"LINE API {endpoint} call failed, retrying in {delay:.2f}s: {e}")
+            finally:
+                elapsed = time.perf_counter() - started_at
+                self.latency[endpoint].observe(elapsed)
+                self.network_seconds[endpoint] += elapsed
+            self.retries[endpoint] += 1
+            self.backoff_seconds[endpoint] += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def reply(self, reply_token: str, messages: list[Message]) -> None:
+        await self._call("reply", self.api.reply_message, ReplyMessageRequest(reply_token=reply_token, messages=messages))
+
+    async def _send(self, endpoint: str, method, request, retry_key: str | None, budget: RetryBudget | None) -> None:
+        try:
+            await self._call(endpoint, method, request, x_line_retry_key=retry_key or str(uuid.uuid4()), budget=budget)
+        except Exception as e:
+            if not is_accepted_replay(e):
+                raise
+            logger.info(f"LINE API {endpoint} already accepted with retry key {retry_key}")
+
+    async def push(
+        self, to: str, messages: list[Message], budget: RetryBudget | None = None, retry_key: str | None = None
+    ) -> None:
+        await self._send("push", self.api.push_message, PushMessageRequest(to=to, messages=messages), retry_key, budget)
+
+    async def multicast(
+        self, to: list[str], messages: list[Message], budget: RetryBudget | None = None, retry_key: str | None = None
+    ) -> None:
+        await self._send("multicast", self.api.multicast, MulticastRequest(to=to, messages=messages), retry_key, budget)
+
+    @property
+    def max_call_seconds(self) -> float:
+        """
+        The longest a call can take with every attempt timing out and the longest backoff between them,
+        not counting a `Retry-After` longer than `backoff_cap`.
+        """
+        return (self.max_retries + 1) * self.timeout + self.max_retries * self.backoff_cap
+
+    async def get_profile(self, user_id: str) -> UserProfileResponse:
+        return await self._call("profile", self.api.get_profile, user_id)
+
+    def stats(self) -> dict:
+        return {
+            endpoint: {
+                "errors": self.errors[endpoint],
+                "retries": self.retries[endpoint],
+                "limiter_wait_seconds": round(self.limiter_wait_seconds[endpoint], 3),
+                "backoff_seconds": round(self.backoff_seconds[endpoint], 3),
+                "network_seconds": round(self.network_seconds[endpoint], 3),
+                "latency": self.latency[endpoint].snapshot(),
+            }
+            for endpoint in ENDPOINTS
+        }
+
+
+line_client = LineClient(
+    LINE_CHANNEL_ACCESS_TOKEN,
+    pool_size=LINE_API_POOL_SIZE,
+    timeout=LINE_API_TIMEOUT,
+    rate_limits=RATE_LIMITS,
+    max_retries=LINE_API_MAX_RETRIES,
+    backoff_base=LINE_API_BACKOFF_BASE,
+    backoff_cap=LINE_API_BACKOFF_CAP,
+)
@@ -1,21 +1,80 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 
 import psycopg
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.responses import Response
 from linebot.v3.exceptions import InvalidSignatureError
 
-from routine_bot.constants import DATABASE_URL, LOGGING_CONFIG, REMINDER_TOKEN
-from routine_bot.db import init_db
-from routine_bot.handlers import handler
+import routine_bot.async_db as db
+from routine_bot.cache import chat_cache
+from routine_bot.constants import (
+    DATABASE_URL,
+    LOGGING_CONFIG,
+    OUTBOX_DRAIN_INTERVAL,
+    PREMIUM_SWEEP_INTERVAL,
+    REMINDER_TOKEN,
+    SCHEDULER_ENABLED,
+    WEBHOOK_DEDUP_PURGE_INTERVAL,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_QUEUE_MAX_SIZE,
+    WEBHOOK_WORKERS,
+)
+from routine_bot.entitlement import sweep_periodically
+from routine_bot.handlers import handler, webhook_deduplicator
+from routine_bot.invalidation import listen
+from routine_bot.line_client import line_client
+from routine_bot.migrate import migrate
+from routine_bot.outbox import drain_periodically
+from routine_bot.reminder import run_reminders
+from routine_bot.scheduler import run_scheduler
+from routine_bot.webhook import QueueFullError, WebhookQueue
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
-with psycopg.connect(conninfo=DATABASE_URL) as conn:
-    init_db(conn)
+webhook_queue = WebhookQueue(handler, maxsize=WEBHOOK_QUEUE_MAX_SIZE, workers=WEBHOOK_WORKERS)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # runs once before serving, so the blocking connection is harmless here
+    with psycopg.connect(conninfo=DATABASE_URL) as conn:
+        migrate(conn)
+    await db.pool.open(wait=True)
+    logger.info("Database connection pool opened")
+    await line_client.open()
+    invalidation_listener = asyncio.create_task(listen())
+    webhook_event_purger = asyncio.create_task(webhook_deduplicator.purge_periodically(WEBHOOK_DEDUP_PURGE_INTERVAL))
+    outbox_drainer = asyncio.create_task(drain_periodically(OUTBOX_DRAIN_INTERVAL))
+    premium_sweeper = asyncio.create_task(sweep_periodically(PREMIUM_SWEEP_INTERVAL))
+    reminder_scheduler = asyncio.create_task(run_scheduler()) if SCHEDULER_ENABLED else None
+    webhook_queue.start()
+    yield
+    await webhook_queue.drain(timeout=WEBHOOK_DRAIN_TIMEOUT)
+    if reminder_scheduler is not None:
+        reminder_scheduler.cancel()
+    outbox_drainer.cancel()
+    premium_sweeper.cancel()
+    webhook_event_purger.cancel()
+    invalidation_listener.cancel()
+    await line_client.close()
+    await db.pool.close()
+    logger.info("Database connection pool closed")
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def verify_bearer_token(request: Request) -> None:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid Authorization header")
+    token = auth_header.split(" ")[1]
+    if token != REMINDER_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
 
 @app.post("/webhook")
@@ -30,7 +89,7 @@ async def webhook(request: Request):
     body = await request.body()
 
     try:
-        handler.handle(body.decode("utf-8"), signature)
+        events = handler.parse(body, signature)
     except InvalidSignatureError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,17 +99,42 @@ async def webhook(request: Request):
         logger.error(str(e), exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal Server Error")
 
+    # events are handled by the queue workers, LINE only waits for the acknowledgment
+    try:
+        webhook_queue.submit(events)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy")
+
     return Response(status_code=status.HTTP_200_OK)
 
 
 @app.post("/reminder/run")
 async def run_reminder(request: Request):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid Authorization header")
-    token = auth_header.split(" ")[1]
-    if token != REMINDER_TOKEN:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
+    verify_bearer_token(request)
+    summary = await run_reminders()
+    return asdict(summary)
 
-    with psycopg.connect(conninfo=DATABASE_URL) as conn:
-        pass
+
+@app.get("/stats/pool")
+async def pool_stats(request: Request):
+    verify_bearer_token(request)
+    return db.get_pool_stats()
+
+
+@app.get("/stats/cache")
+async def cache_stats(request: Request):
+    verify_bearer_token(request)
+    return {"chats": chat_cache.stats()}
+
+
+@app.get("/stats/webhook")
+async def webhook_stats(request: Request):
+    verify_bearer_token(request)
+    return {**webhook_queue.stats(), "dedup": webhook_deduplicator.stats()}
+
+
+@app.get("/stats/line")
+async def line_stats(request: Request):
+    verify_bearer_token(request)
+    return line_client.stats()
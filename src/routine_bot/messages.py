@@ -1,10 +1,12 @@
 from datetime import datetime
+from functools import cache, lru_cache
 
 from linebot.v3.messaging import (
     ButtonsTemplate,
     DatetimePickerAction,
     FlexBox,
     FlexBubble,
+    FlexCarousel,
     FlexMessage,
     FlexSeparator,
     FlexText,
@@ -16,6 +18,13 @@ from linebot.v3.messaging import (
 from src.routine_bot.constants import FREE_PLAN_MAX_EVENTS
 from src.routine_bot.models import EventData
 
+# LINE limit on the number of bubbles in a single carousel.
+MAX_CAROUSEL_BUBBLES = 12
+
+# Messages without parameters are built once with `cache`, and the ones with hashable parameters are kept
+# in a bounded `lru_cache`. Cached messages are shared between replies, so they must never be mutated.
+MESSAGE_CACHE_SIZE = 1024
+
 
 def flex_text_bold_line(text: str) -> FlexText:
     return FlexText(text=text, size="md", weight="bold")
@@ -46,6 +55,7 @@ def flex_bubble_template(title: str, lines: list[str]) -> FlexBubble:
 
 class NewEventMsg:
     @staticmethod
+    @cache
     def prompt_for_event_name() -> TextMessage:
         return TextMessage(text="🎯 請輸入欲新增的事件名稱（限 2 至 20 字元）")
 
@@ -92,6 +102,7 @@ class NewEventMsg:
         return msg
 
     @staticmethod
+    @cache
     def reminder_cycle_example() -> FlexMessage:
         bubble = flex_bubble_template(
             title="🌟 自訂週期輸入格式",
@@ -170,6 +181,7 @@ class NewEventMsg:
 
 class FindEventMsg:
     @staticmethod
+    @cache
     def prompt_for_event_name() -> TextMessage:
         return TextMessage(text="🎯 請輸入欲查詢的事件名稱")
 
@@ -204,28 +216,67 @@ class FindEventMsg:
         return msg
 
 
+class ReminderMsg:
+    @staticmethod
+    def event_due_bubble(event: EventData) -> FlexBubble:
+        # cached on the displayed fields only, the reminder timestamps of the event change on every reminder
+        return ReminderMsg.due_bubble(event.event_name, event.last_done_at.strftime("%Y-%m-%d"), event.reminder_cycle)
+
+    @staticmethod
+    @lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+    def due_bubble(event_name: str, last_done_date: str, reminder_cycle: str | None) -> FlexBubble:
+        return flex_bubble_template(
+            title="⏰ 提醒時間到！",
+            lines=[
+                f"🎯［{event_name}］",
+                f"🗓 上次完成日期：{last_done_date}",
+                f"⏰ 提醒週期：{reminder_cycle}",
+            ],
+        )
+
+    @staticmethod
+    def event_due(event: EventData) -> FlexMessage:
+        return FlexMessage(altText=f"⏰［{event.event_name}］提醒時間到！", contents=ReminderMsg.event_due_bubble(event))
+
+    @staticmethod
+    def events_due(events: list[EventData]) -> FlexMessage:
+        """
+        Digest of several due events in one carousel, at most `MAX_CAROUSEL_BUBBLES` of them.
+        """
+        if len(events) == 1:
+            return ReminderMsg.event_due(events[0])
+        carousel = FlexCarousel(contents=[ReminderMsg.event_due_bubble(event) for event in events])
+        return FlexMessage(altText=f"⏰ {len(events)} 個事件提醒時間到！", contents=carousel)
+
+
 class ErrorMsg:
     @staticmethod
+    @cache
     def unrecognized_command() -> TextMessage:
         return TextMessage(text="指令無法辨識🤣 請再試一次😌")
 
     @staticmethod
+    @lru_cache(maxsize=MESSAGE_CACHE_SIZE)
     def event_name_duplicated(event_name: str) -> TextMessage:
         return TextMessage(text=f"已有叫做［{event_name}］的事件🤣 請換個名稱再試一次😌")
 
     @staticmethod
+    @lru_cache(maxsize=MESSAGE_CACHE_SIZE)
     def event_name_not_found(event_name: str) -> TextMessage:
         return TextMessage(text=f"找不到叫做［{event_name}］的事件😱 請再試一次😌")
 
     @staticmethod
+    @cache
     def event_name_too_long() -> TextMessage:
         return TextMessage(text="事件名稱不可以超過 20 字元🤣 請再試一次😌")
 
     @staticmethod
+    @cache
     def event_name_too_short() -> TextMessage:
         return TextMessage(text="事件名稱不可以少於 2 字元🤣 請再試一次😌")
 
     @staticmethod
+    @cache
     def max_events_reached() -> FlexMessage:
         bubble = flex_bubble_template(
             title="⚠️ 無法新增事件",
@@ -240,6 +291,7 @@ class ErrorMsg:
         return msg
 
     @staticmethod
+    @cache
     def reminder_disabled() -> FlexMessage:
         bubble = flex_bubble_template(
             title="🔕 提醒功能已停用",
@@ -256,15 +308,18 @@ class ErrorMsg:
 
 class GreetingMsg:
     @staticmethod
+    @cache
     def random() -> TextMessage:
         return TextMessage(text="hello!")
 
 
 class AbortMsg:
     @staticmethod
+    @cache
     def no_ongoing_chat() -> str:
         return TextMessage(text="沒有進行中的操作可以取消🤣")
 
     @staticmethod
+    @cache
     def ongoing_chat_aborted() -> str:
         return TextMessage(text="已中止目前的操作🙏\n請重新輸入新的指令😉")
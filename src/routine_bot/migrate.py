@@ -0,0 +1,84 @@
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg
+from psycopg import errors
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Arbitrary key of the advisory lock held while migrating,
+# only the worker holding it applies migrations and the others wait for it.
+MIGRATION_LOCK_ID = 7_341_907_001
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+
+def load_migrations() -> list[Migration]:
+    """
+    Read `migrations/NNNN_<name>.sql` files ordered by version.
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_FILENAME.match(path.name)
+        if match is None:
+            continue
+        migrations.append(Migration(version=int(match[1]), name=match[2], sql=path.read_text(encoding="utf-8")))
+    migrations.sort(key=lambda m: m.version)
+    return migrations
+
+
+def get_schema_version(conn: psycopg.Connection) -> int:
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MAX(version) FROM schema_version")
+            return cur.fetchone()[0] or 0
+    except errors.UndefinedTable:
+        conn.rollback()
+        return 0
+
+
+def migrate(conn: psycopg.Connection) -> None:
+    """
+    Bring the schema up to the latest migration.
+
+    When the schema is already up to date this costs a single query. Otherwise the pending migrations
+    are applied in one transaction under an advisory lock, so when several workers start together
+    only one of them migrates and the others find the work done once they get the lock.
+    """
+    migrations = load_migrations()
+    latest_version = migrations[-1].version
+    if get_schema_version(conn) >= latest_version:
+        conn.rollback()
+        logger.info(f"Database schema is up to date: version {latest_version}")
+        return
+
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current_version = cur.fetchone()[0]
+            for migration in migrations:
+                if migration.version <= current_version:
+                    continue
+                cur.execute(migration.sql)
+                cur.execute("INSERT INTO schema_version (version) VALUES (%s)", (migration.version,))
+                logger.info(f"Migration applied: {migration.version:04d}_{migration.name}")
+    logger.info(f"Database schema migrated: version {latest_version}")
@@ -0,0 +1,168 @@
+-- Users Table
+-- -----------
+-- - user_id :
+--     Unique identifier for each user (corresponds to the LINE user ID).
+-- - created_at :
+--     Timestamp when the user record was created.
+-- - display_name :
+--     Display name of the user, retrieved from LINE's Get Profile API.
+-- - picture_url :
+--     URL of the user's profile picture, retrieved from LINE's Get Profile API.
+-- - profile_refreshed_at :
+--     Timestamp of the most recent update from LINE's Get Profile API.
+-- - notification_time :
+--     Daily time-of-day (without date) when the user prefers to receive notifications.
+-- - event_count :
+--     Total number of events owned by the user.
+--     Users on free plan can have up to 5 events.
+-- - is_premium :
+--     Indicates whether the user is subscribed to a premium plan.
+-- - premium_until :
+--     Expiration timestamp of the user's premium feature access.
+--     Users can unsubscribe at any time, but premium access remains active until this timestamp.
+--     Post-expiration behavior for users with > 5 events:
+--     - Can view, update, edit, and delete all existing events
+--     - Cannot create new events until event_count <= 5 or premium is renewed
+--     - Will NOT receive notifications/reminders for any events while over the 5-event limit
+--     (notifications resume once event_count <= 5 or premium is renewed)
+-- - is_active :
+--     Indicates whether the user has blocked the bot
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    display_name TEXT NOT NULL,
+    picture_url TEXT NOT NULL,
+    profile_refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    notification_time TIME NOT NULL DEFAULT '00:00',
+    event_count INTEGER NOT NULL DEFAULT 0,
+    is_premium BOOLEAN NOT NULL DEFAULT FALSE,
+    premium_until TIMESTAMPTZ,
+    is_active BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- Chats Table
+-- ------------
+-- - chat_id :
+--     Unique identifier for each chat session.
+-- - created_at :
+--     Timestamp indicating when the chat record was created.
+-- - user_id :
+--     Identifier of the user associated with the chat session.
+-- - chat_type :
+--     Specifies the purpose of the chat, i.e., which event or action is being processed.
+--     Refer to `ChatType` in `constants.py`.
+-- - current_step :
+--     Indicates the current processing stage within the chat workflow.
+--     Refer to the corresponding `*Steps` constants in `constants.py`.
+--     Set to NULL when the chat session is completed.
+-- - payload :
+--     JSON object containing intermediate data collected during the chat flow.
+-- - status :
+--     The current status of the chat session.
+--     Refer to `ChatStatus` in `constants.py`.
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    chat_type TEXT NOT NULL,
+    current_step TEXT,
+    payload JSON,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user_status ON chats (user_id, status);
+
+-- Events Table
+-- ------------
+-- - event_id :
+--     Unique identifier for each event.
+-- - created_at :
+--     Timestamp indicating when the event record was created.
+-- - event_name :
+--     Name of the event.
+-- - user_id :
+--     Identifier of the user who owns the event.
+-- - last_done_at :
+--     Timestamp of the most recent time the user completed the event.
+--     Event completion timestamps are stored at day-level precision,
+--     with the time set to 00:00 (UTC+8).
+-- - reminder :
+--     Indicates whether reminders are enabled for the event.
+-- - reminder_cycle :
+--     Specifies the recurrence interval of the reminder (e.g., daily, weekly).
+-- - next_reminder :
+--     If the current time is later than this timestamp, the reminder is considered due,
+--     and the bot will send the reminder on its next scheduled run.
+-- - last_notification_sent_at:
+--     Timestamp indicating when the last reminder notification is sent.
+-- - share_count :
+--     The number of users this event is shared with.
+--     All shared users will also receive reminder notifications.
+-- - is_active :
+--     If a user blocks the bot, the events they own are marked as inactive,
+--     and their associated reminders will no longer be triggered.
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    event_name TEXT NOT NULL,
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    last_done_at TIMESTAMPTZ NOT NULL,
+    reminder BOOLEAN NOT NULL,
+    reminder_cycle TEXT,
+    next_reminder TIMESTAMPTZ,
+    last_notification_sent_at TIMESTAMPTZ,
+    share_count INTEGER NOT NULL DEFAULT 0,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    -- Prevent duplicate event names per user
+    UNIQUE (user_id, event_name)
+);
+
+-- Updates Table
+-- --------------
+-- - update_id :
+--     Unique identifier for each update entry.
+--     This table records every instance in which a user updates
+--     the completion time of an event.
+-- - created_at :
+--     Timestamp indicating when the update entry was created.
+-- - event_id :
+--     Identifier of the event associated with this update.
+-- - event_name :
+--     Name of the event associated with this update.
+-- - user_id :
+--     Identifier of the user who owns the event.
+-- - done_at :
+--     Timestamp representing the newly updated completion time of the event.
+--     Event completion times are stored with day-level precision,
+--     with the time component normalized to 00:00 (UTC+8).
+CREATE TABLE IF NOT EXISTS updates (
+    update_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    event_id TEXT NOT NULL REFERENCES events(event_id),
+    event_name TEXT NOT NULL,
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    done_at TIMESTAMPTZ NOT NULL
+);
+
+-- Shares Table
+-- ------------
+-- - share_id :
+--     Unique identifier for each share record.
+--     The shared events will also send reminder notification to receipients.
+-- - created_at :
+--     Timestamp indicating when the share record was created.
+-- - event_id :
+--     Identifier of the event being shared.
+-- - event_name :
+--     Name of the event being shared.
+-- - owner_id :
+--     Identifier of the user who owns the event.
+-- - recipient_id :
+--     Identifier of the user with whom the event is shared.
+CREATE TABLE IF NOT EXISTS shares (
+    share_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    event_id TEXT NOT NULL REFERENCES events(event_id),
+    event_name TEXT NOT NULL,
+    owner_id TEXT NOT NULL REFERENCES users(user_id),
+    recipient_id TEXT NOT NULL
+);
@@ -0,0 +1,11 @@
+-- Partial index on due-able events, ordered like the keyset of the reminder scan.
+CREATE INDEX IF NOT EXISTS idx_events_due
+ON events (next_reminder, event_id)
+WHERE is_active AND reminder;
+
+-- Covers `get_event_recent_update_times`, so the history is read from the index alone.
+CREATE INDEX IF NOT EXISTS idx_updates_event_done_at ON updates (event_id, done_at DESC);
+
+-- Share lookups by recipient or by event, covering the other side of the share.
+CREATE INDEX IF NOT EXISTS idx_shares_recipient ON shares (recipient_id) INCLUDE (event_id);
+CREATE INDEX IF NOT EXISTS idx_shares_event ON shares (event_id) INCLUDE (recipient_id);
@@ -0,0 +1,12 @@
+-- Webhook Events Table
+-- --------------------
+-- - webhook_event_id :
+--     ID of a handled webhook event (`webhookEventId`), identical across redeliveries of the same event.
+-- - received_at :
+--     Timestamp when the event was first received.
+--     Rows older than the dedup TTL are purged, redeliveries past that point are not expected.
+CREATE TABLE IF NOT EXISTS webhook_events (
+    webhook_event_id TEXT PRIMARY KEY,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_events_received_at ON webhook_events (received_at);
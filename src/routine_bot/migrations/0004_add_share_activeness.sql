@@ -0,0 +1,6 @@
+-- Shares Table
+-- ------------
+-- - is_active :
+--     Whether the recipient still follows the bot.
+--     Toggled together with the recipient's own activeness on follow / unfollow.
+ALTER TABLE shares ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
@@ -0,0 +1,35 @@
+-- Outbox Table
+-- ------------
+-- - outbox_id :
+--     Unique identifier for each notification, also the order in which they are sent.
+-- - created_at :
+--     Timestamp when the notification was scheduled.
+-- - event_id :
+--     Identifier of the event the reminder is about.
+-- - recipient_id :
+--     Identifier of the user to notify, either the owner or a share recipient of the event.
+-- - status :
+--     Delivery status of the notification (pending / delivered / dead).
+--     Dead notifications ran out of attempts and are kept for inspection.
+-- - attempts :
+--     The number of failed delivery attempts so far.
+-- - available_at :
+--     Timestamp before which a failed notification is not retried.
+-- - last_error :
+--     Error of the last failed delivery attempt.
+-- - delivered_at :
+--     Timestamp when the notification was delivered.
+--     Delivered rows are purged after the outbox retention period.
+CREATE TABLE IF NOT EXISTS outbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    event_id TEXT NOT NULL REFERENCES events(event_id),
+    recipient_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    delivered_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (available_at, outbox_id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_delivered ON outbox (delivered_at) WHERE status = 'delivered';
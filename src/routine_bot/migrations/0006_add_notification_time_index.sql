@@ -0,0 +1,5 @@
+-- Users Table
+-- -----------
+-- - idx_users_notification_time :
+--     Serves the built-in scheduler, which scans the users of one `notification_time` slot per tick.
+CREATE INDEX IF NOT EXISTS idx_users_notification_time ON users (notification_time);
@@ -0,0 +1,26 @@
+-- Events Table
+-- ------------
+-- - reminder_cycle_count :
+--     Number of units between two reminders, e.g. 3 for "3 day".
+-- - reminder_cycle_unit :
+--     Unit of the reminder cycle (day / week / month).
+--     Both are set for events with a reminder, and replace the free-text `reminder_cycle`.
+ALTER TABLE events
+    ADD COLUMN IF NOT EXISTS reminder_cycle_count INTEGER CHECK (reminder_cycle_count > 0),
+    ADD COLUMN IF NOT EXISTS reminder_cycle_unit TEXT CHECK (reminder_cycle_unit IN ('day', 'week', 'month'));
+
+ALTER TABLE events
+    ADD CONSTRAINT events_reminder_cycle_complete
+    CHECK ((reminder_cycle_count IS NULL) = (reminder_cycle_unit IS NULL));
+
+UPDATE events
+SET reminder_cycle_count = split_part(reminder_cycle, ' ', 1)::INTEGER,
+    reminder_cycle_unit = split_part(reminder_cycle, ' ', 2)
+WHERE reminder_cycle ~ '^[1-9][0-9]* (day|week|month)$';
+
+-- a cycle that never parsed could not be advanced anyway
+UPDATE events
+SET reminder = FALSE
+WHERE reminder AND reminder_cycle_count IS NULL;
+
+ALTER TABLE events DROP COLUMN reminder_cycle;
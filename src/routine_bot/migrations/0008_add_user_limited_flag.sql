@@ -0,0 +1,20 @@
+-- Users Table
+-- -----------
+-- - is_limited :
+--     Whether the user is over the free plan limit, i.e. event_count > 5 without premium access.
+--     Limited users cannot create events and get no reminders.
+--     Kept up to date when the event count or the premium access changes.
+--     When premium access expires, the flag is set by the periodic sweeper.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_limited BOOLEAN NOT NULL DEFAULT FALSE;
+
+UPDATE users
+SET is_limited = event_count > 5 AND (premium_until IS NULL OR premium_until <= NOW());
+
+-- Lets the reminder scan skip limited users, and the scheduler scan one notification_time slot of them.
+CREATE INDEX IF NOT EXISTS idx_users_reminders_enabled ON users (notification_time, user_id) WHERE NOT is_limited;
+
+-- Superseded by idx_users_reminders_enabled, which serves the same slot scans.
+DROP INDEX IF EXISTS idx_users_notification_time;
+
+-- Serves the sweeper, which looks for premium access that expired on users not flagged yet.
+CREATE INDEX IF NOT EXISTS idx_users_premium_until ON users (premium_until) WHERE NOT is_limited;
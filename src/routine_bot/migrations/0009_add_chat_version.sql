@@ -0,0 +1,7 @@
+-- Chats Table
+-- -----------
+-- - version :
+--     Incremented on every write of the chat state.
+--     Writes only apply to the version they were based on, so a worker holding a stale cached chat
+--     cannot overwrite the state written by another worker.
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
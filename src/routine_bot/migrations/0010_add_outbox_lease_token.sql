@@ -0,0 +1,7 @@
+-- Outbox Table
+-- ------------
+-- - lease_token :
+--     Identifies the claim holding the lease on the notification, NULL when it is not claimed.
+--     A sender only marks the notifications it still holds, so one whose lease ran out
+--     cannot overwrite the outcome recorded by the sender that claimed them next.
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS lease_token UUID;
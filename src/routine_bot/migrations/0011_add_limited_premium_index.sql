@@ -0,0 +1,8 @@
+-- Users Table
+-- -----------
+-- - is_limited :
+--     Premium access is granted outside of the bot, so the periodic sweeper also clears the flag
+--     of limited users who got premium access.
+
+-- Serves the sweeper, which looks for premium access granted to users still flagged.
+CREATE INDEX IF NOT EXISTS idx_users_limited_premium_until ON users (premium_until) WHERE is_limited;
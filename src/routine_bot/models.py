@@ -5,32 +5,32 @@ from src.routine_bot.constants import FREE_PLAN_MAX_EVENTS, TZ_TAIPEI
 from src.routine_bot.enums import ChatStatus
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UserData:
     user_id: str
     display_name: str
-    picturl_url: str
+    picture_url: str
     profile_refreshed_at: datetime
     notification_time: time
     event_count: int
     is_premium: bool
     premium_until: datetime | None
     is_active: bool
+    # maintained by the DB on event count and premium changes, see `users.is_limited`
+    is_limited: bool
+    # evaluated once when the user is loaded rather than on every access
+    has_premium_access: bool = field(init=False)
 
-    @property
-    def has_premium_access(self) -> bool:
-        return self.premium_until and self.premium_until > datetime.now(TZ_TAIPEI)
+    def __post_init__(self):
+        has_premium_access = self.premium_until is not None and self.premium_until > datetime.now(TZ_TAIPEI)
+        object.__setattr__(self, "has_premium_access", has_premium_access)
 
     @property
     def reached_free_plan_max_events(self) -> bool:
         return self.event_count > FREE_PLAN_MAX_EVENTS
 
-    @property
-    def is_limited(self) -> bool:
-        return self.reached_free_plan_max_events and not self.has_premium_access
-
 
-@dataclass
+@dataclass(slots=True)
 class ChatData:
     chat_id: str
     user_id: str
@@ -38,22 +38,31 @@ class ChatData:
     current_step: str | None
     payload: dict = field(default_factory=dict)
     status: str = ChatStatus.ONGOING.value
+    # version of the stored chat this copy is based on, see `chats.version`
+    version: int = 0
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EventData:
     event_id: str
     event_name: str
     user_id: str
     last_done_at: datetime
     reminder: bool
-    reminder_cycle: str | None = None
+    reminder_cycle_count: int | None = None
+    reminder_cycle_unit: str | None = None
     next_reminder: datetime | None = None
     last_notification_sent_at: datetime | None = None
     share_count: int = 0
 
+    @property
+    def reminder_cycle(self) -> str | None:
+        if self.reminder_cycle_count is None:
+            return None
+        return f"{self.reminder_cycle_count} {self.reminder_cycle_unit}"
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UpdateData:
     update_id: str
     event_id: str
@@ -62,10 +71,43 @@ class UpdateData:
     done_at: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ShareData:
     share_id: str
     event_id: str
     event_name: str
     owner_id: str
     recipient_id: str
+
+
+@dataclass(slots=True, frozen=True)
+class OutboxData:
+    outbox_id: int
+    event_id: str
+    recipient_id: str
+    attempts: int = 0
+
+
+@dataclass(slots=True)
+class EventBatch:
+    """
+    Columnar batch of due events for the reminder scan, one list per column.
+
+    The scan reads many rows but only a few of their fields, so it skips building an `EventData` per row.
+    """
+
+    event_ids: list[str] = field(default_factory=list)
+    user_ids: list[str] = field(default_factory=list)
+    last_done_at: list[datetime] = field(default_factory=list)
+    reminder_cycle_counts: list[int | None] = field(default_factory=list)
+    reminder_cycle_units: list[str | None] = field(default_factory=list)
+    next_reminders: list[datetime] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.event_ids)
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> "EventBatch":
+        if not rows:
+            return cls()
+        return cls(*map(list, zip(*rows)))
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from linebot.v3.messaging import Message
+
+import routine_bot.async_db as db
+from routine_bot.constants import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_LEASE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETENTION,
+    OUTBOX_RETRY_DELAY,
+    REMINDER_RETRY_BUDGET,
+)
+from routine_bot.delivery import DeliveryBatch
+from routine_bot.line_client import line_client
+from routine_bot.messages import MAX_CAROUSEL_BUBBLES, ReminderMsg
+from routine_bot.models import EventData
+from routine_bot.ratelimit import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+# Namespace of the `X-Line-Retry-Key`s derived from the outbox IDs of a request.
+RETRY_KEY_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "routine-bot/outbox")
+
+
+@dataclass
+class OutboxDrainSummary:
+    claimed: int = 0
+    delivered: int = 0
+    failed: int = 0
+    dead: int = 0
+    released: int = 0
+    api_calls: int = 0
+    retries: int = 0
+    duration: float = 0.0
+
+
+def retry_key(outbox_ids: list[int]) -> str:
+    """
+    The `X-Line-Retry-Key` of the request sending the notifications, the same whenever they are sent together,
+    so LINE refuses a request replayed by another sender instead of delivering it twice.
+    """
+    return str(uuid.uuid5(RETRY_KEY_NAMESPACE, ",".join(map(str, sorted(outbox_ids)))))
+
+
+async def drain_outbox(batch_size: int = OUTBOX_BATCH_SIZE, lease: float = OUTBOX_LEASE) -> OutboxDrainSummary:
+    """
+    Send every pending notification that is ready, one batch at a time.
+
+    Each batch is claimed with a lease in a short transaction, sent without holding a connection,
+    then marked in a second short transaction. Any number of senders can drain the outbox in parallel
+    without sending the same notification twice:
+    - no request is started once the lease could run out before it completes, the unsent notifications
+      are released instead
+    - only the notifications still leased by this sender are marked
+    - the retry key of a request is derived from its notifications, so a replay is refused by LINE
+    If a sender dies mid-batch, its notifications are claimed again once the lease runs out.
+
+    The notifications of each recipient are grouped into carousel digests of up to 12 bubbles, and the
+    whole batch is delivered through a `DeliveryBatch`, which packs the digests into multicasts.
+
+    - delivered : the notification reached the recipient
+    - failed : the notification is retried after a delay that doubles on every attempt
+    - dead : the notification failed `OUTBOX_MAX_ATTEMPTS` times and is no longer retried
+    - released : the notification was not sent before the lease ran short, it is claimed again by the next drain
+    """
+    summary = OutboxDrainSummary()
+    started_at = time.perf_counter()
+    # shared by the whole drain, so a struggling API is not retried batch after batch
+    retry_budget = RetryBudget(REMINDER_RETRY_BUDGET)
+
+    while True:
+        lease_token = str(uuid.uuid4())
+        async with db.pool.connection() as conn:
+            notifications = await db.claim_outbox(lease_token, batch_size, timedelta(seconds=lease), conn)
+        # leaves enough of the lease for the last request to complete
+        deadline = time.monotonic() + lease - line_client.max_call_seconds
+
+        events_by_recipient: dict[str, dict[str, EventData]] = defaultdict(dict)
+        outbox_ids: dict[tuple[str, str], list[int]] = defaultdict(list)
+        for notification, event in notifications:
+            events_by_recipient[notification.recipient_id][event.event_id] = event
+            # the same reminder may be pending twice, e.g. after a long outage
+            outbox_ids[(notification.recipient_id, event.event_id)].append(notification.outbox_id)
+
+        batch = DeliveryBatch()
+        digests: dict[str, tuple[list[EventData], Message]] = {}
+        for recipient_id, events_by_id in events_by_recipient.items():
+            # sorted, so that recipients of the same events share the same digests
+            events = sorted(events_by_id.values(), key=lambda event: event.event_id)
+            for i in range(0, len(events), MAX_CAROUSEL_BUBBLES):
+                chunk = events[i : i + MAX_CAROUSEL_BUBBLES]
+                key = ",".join(event.event_id for event in chunk)
+                if key not in digests:
+                    digests[key] = (chunk, ReminderMsg.events_due(chunk))
+                batch.add(key, digests[key][1], [recipient_id])
+
+        def request_outbox_ids(keys: tuple[str, ...], recipient_ids: list[str]) -> list[int]:
+            return [
+                outbox_id
+                for recipient_id in recipient_ids
+                for key in keys
+                for event in digests[key][0]
+                for outbox_id in outbox_ids[(recipient_id, event.event_id)]
+            ]
+
+        outcomes = await batch.send(
+            line_client,
+            budget=retry_budget,
+            deadline=deadline,
+            retry_key=lambda keys, recipient_ids: retry_key(request_outbox_ids(keys, recipient_ids)),
+        )
+
+        delivered_ids = []
+        failed_ids: dict[str, list[int]] = defaultdict(list)
+        released_ids = []
+        for outcome in outcomes:
+            ids = request_outbox_ids((outcome.key,), [outcome.recipient_id])
+            if outcome.delivered:
+                delivered_ids.extend(ids)
+            elif outcome.skipped:
+                released_ids.extend(ids)
+            else:
+                failed_ids[outcome.error].extend(ids)
+        async with db.pool.connection() as conn:
+            summary.delivered += await db.mark_outbox_delivered(delivered_ids, lease_token, conn)
+            for error, ids in failed_ids.items():
+                summary.dead += await db.mark_outbox_failed(
+                    ids, lease_token, error, OUTBOX_MAX_ATTEMPTS, timedelta(seconds=OUTBOX_RETRY_DELAY), conn
+                )
+            await db.release_outbox(released_ids, lease_token, conn)
+        summary.claimed += len(notifications)
+        summary.failed += sum(len(ids) for ids in failed_ids.values())
+        summary.released += len(released_ids)
+        summary.api_calls += batch.api_calls
+        # claimed notifications are postponed, so they are not claimed again in this drain,
+        # released ones are left to the next drain
+        if len(notifications) < batch_size or released_ids:
+            break
+
+    summary.retries = retry_budget.used
+    summary.duration = time.perf_counter() - started_at
+    logger.info(
+        f"Outbox drained: claimed={summary.claimed} delivered={summary.delivered} failed={summary.failed} "
+        f"dead={summary.dead} released={summary.released} api_calls={summary.api_calls} "
+        f"duration={summary.duration:.2f}s"
+    )
+    return summary
+
+
+# Set to drain the outbox right away instead of at the next interval, see `request_drain`.
+_drain_requested = asyncio.Event()
+
+
+def request_drain() -> None:
+    """
+    Wake up `drain_periodically`, e.g. once a reminder run has filled the outbox.
+    Returns at once, the notifications are sent in the background.
+    """
+    _drain_requested.set()
+
+
+async def drain_periodically(interval: float) -> None:
+    """
+    Drain the outbox and purge the delivered notifications every `interval` seconds, or as soon as
+    a drain is requested, until cancelled.
+
+    Picks up the notifications whose retry delay has passed, and the ones left by a crashed sender.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(_drain_requested.wait(), timeout=interval)
+        except TimeoutError:
+            pass
+        _drain_requested.clear()
+        try:
+            await drain_outbox()
+            async with db.pool.connection() as conn:
+                await db.purge_outbox(timedelta(seconds=OUTBOX_RETENTION), conn)
+        except Exception:
+            logger.warning("Failed to drain the outbox", exc_info=True)
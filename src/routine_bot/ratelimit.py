@@ -0,0 +1,62 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter, refilled at `rate` tokens per second up to `capacity`.
+
+    Callers queue on a lock, so tokens are handed out in arrival order and a burst is spread out
+    instead of hammering the API all at once.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Take one token, waiting for it if needed, and return the seconds spent waiting.
+        """
+        started_at = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        return time.monotonic() - started_at
+
+
+class RetryBudget:
+    """
+    Caps the total number of retries across many calls, e.g. over a whole reminder run,
+    so a struggling API is not hit with a retry storm on top of the regular traffic.
+    """
+
+    def __init__(self, retries: int):
+        self.retries = retries
+        self.used = 0
+
+    def try_spend(self) -> bool:
+        if self.used >= self.retries:
+            return False
+        self.used += 1
+        return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """
+    Exponential backoff with full jitter, never shorter than the server's `Retry-After`.
+    """
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from dateutil.relativedelta import relativedelta
+
+from routine_bot.enums import SUPPORTED_UNITS, CycleUnit
+
+DAYS_PER_UNIT = {CycleUnit.DAY: 1, CycleUnit.WEEK: 7}
+
+
+@lru_cache(maxsize=1024)
+def parse_cycle(cycle: str) -> tuple[int, CycleUnit] | None:
+    """
+    Parse a reminder cycle such as `"2 week"` into `(2, CycleUnit.WEEK)`, `None` if it is invalid.
+
+    Cached, since the same few cycles are shared by most events.
+    """
+    try:
+        count, unit = cycle.split(" ", maxsplit=1)
+        count = int(count)
+    except ValueError:
+        return None
+    if unit not in SUPPORTED_UNITS or count <= 0:
+        return None
+    return count, CycleUnit(unit)
+
+
+def add_cycles(anchor: datetime, count: int, unit: CycleUnit, n: int = 1) -> datetime:
+    """
+    The `n`-th occurrence after `anchor`.
+
+    Months are always added to the anchor itself, so a cycle starting on the 31st is clamped to the end
+    of shorter months without drifting, e.g. Jan 31 -> Feb 28 -> Mar 31.
+    """
+    if unit == CycleUnit.MONTH:
+        return anchor + relativedelta(months=count * n)
+    return anchor + timedelta(days=DAYS_PER_UNIT[unit] * count * n)
+
+
+def next_occurrence(anchor: datetime, count: int, unit: CycleUnit, now: datetime) -> datetime:
+    """
+    The first occurrence after `anchor` that is later than `now`, computed without stepping cycle by cycle.
+    Raises `ValueError` if `count` is not positive, such a cycle never moves forward.
+    """
+    if count <= 0:
+        raise ValueError(f"Reminder cycle count must be positive: {count}")
+    if unit == CycleUnit.MONTH:
+        elapsed_months = (now.year - anchor.year) * 12 + (now.month - anchor.month)
+        n = max(1, elapsed_months // count)
+    else:
+        period = timedelta(days=DAYS_PER_UNIT[unit] * count)
+        n = max(1, (now - anchor) // period)
+    # the estimate is off by at most one cycle
+    occurrence = add_cycles(anchor, count, unit, n)
+    while occurrence <= now:
+        n += 1
+        occurrence = add_cycles(anchor, count, unit, n)
+    return occurrence
+
+
+def next_occurrences(
+    anchors: list[datetime], counts: list[int | None], units: list[str | None], now: datetime
+) -> list[datetime | None]:
+    """
+    The next occurrence later than `now` for each event's `(anchor, count, unit)`, `None` where it has no cycle.
+
+    Events overdue by many cycles, e.g. after the reminder runner was down for days, are caught up
+    in a single pass instead of one cycle per run.
+    """
+    return [
+        next_occurrence(anchor, count, CycleUnit(unit), now) if count is not None else None
+        for anchor, count, unit in zip(anchors, counts, units)
+    ]
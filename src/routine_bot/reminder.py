@@ -0,0 +1,85 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time
+from time import perf_counter
+
+import routine_bot.async_db as db
+from routine_bot.constants import REMINDER_BATCH_SIZE, TZ_TAIPEI
+from routine_bot.outbox import request_drain
+from routine_bot.recurrence import next_occurrences
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReminderRunSummary:
+    scanned: int = 0
+    scheduled: int = 0
+    skipped: int = 0
+    notifications: int = 0
+    duration: float = 0.0
+
+
+async def run_reminders(
+    batch_size: int = REMINDER_BATCH_SIZE, notification_slot: tuple[time, time] | None = None
+) -> ReminderRunSummary:
+    """
+    Schedule every due reminder into the outbox, one batch per transaction.
+
+    Each batch is claimed with `FOR UPDATE SKIP LOCKED`, so several runners can work in parallel
+    without scheduling the same reminder twice. The keyset `(next_reminder, event_id)` of the last row
+    bounds the next batch, which keeps skipped events from being scanned again in the same run.
+
+    A notification for the owner and every active share recipient is enqueued in the same transaction
+    that moves `next_reminder` forward, so a crash leaves each reminder either fully scheduled or still due.
+
+    - scheduled : the notifications are enqueued and `next_reminder` is moved to the first occurrence
+      after now, so an event overdue by several cycles is notified once and caught up at once
+    - skipped : the event has no cycle, the reminder stays due
+
+    Events of users over the free plan limit are not scanned at all, see `users.is_limited`.
+
+    With a `notification_slot`, only the users whose `notification_time` falls within it are scanned.
+
+    The notifications are sent in the background by `drain_periodically`, which is woken up once the run
+    is over, so the caller does not wait for the LINE API.
+    """
+    summary = ReminderRunSummary()
+    started_at = perf_counter()
+    after = ("-infinity", "")
+
+    while True:
+        async with db.pool.connection() as conn:
+            batch = await db.claim_due_reminders(after, batch_size, conn, notification_slot)
+            if batch:
+                after = (batch.next_reminders[-1], batch.event_ids[-1])
+            next_reminders = next_occurrences(
+                [last_done_at.astimezone(TZ_TAIPEI) for last_done_at in batch.last_done_at],
+                batch.reminder_cycle_counts,
+                batch.reminder_cycle_units,
+                now=datetime.now(TZ_TAIPEI),
+            )
+            due_event_ids = []
+            advanced_to = []
+            for event_id, next_reminder in zip(batch.event_ids, next_reminders):
+                if next_reminder is None:
+                    logger.warning(f"Reminder without a cycle: {event_id}")
+                    summary.skipped += 1
+                    continue
+                due_event_ids.append(event_id)
+                advanced_to.append(next_reminder)
+            summary.notifications += await db.enqueue_reminders(due_event_ids, conn)
+            await db.advance_reminders(due_event_ids, advanced_to, conn)
+        summary.scanned += len(batch)
+        summary.scheduled += len(due_event_ids)
+        if len(batch) < batch_size:
+            break
+
+    summary.duration = perf_counter() - started_at
+    logger.info(
+        f"Reminder run finished: scanned={summary.scanned} scheduled={summary.scheduled} "
+        f"skipped={summary.skipped} notifications={summary.notifications} duration={summary.duration:.2f}s"
+    )
+    if summary.notifications:
+        request_drain()
+    return summary
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import datetime, time, timedelta
+
+import psycopg
+
+from routine_bot.constants import DATABASE_URL, SCHEDULER_MAX_CATCH_UP, TZ_TAIPEI
+from routine_bot.reminder import run_reminders
+
+logger = logging.getLogger(__name__)
+
+# Session-level advisory lock held by the worker elected to schedule reminders.
+SCHEDULER_LOCK_ID = 7_341_907_002
+
+SLOT_WIDTH = timedelta(minutes=1)
+
+
+def get_slot(minute: datetime) -> tuple[time, time]:
+    """
+    Range of `notification_time` covered by the one-minute slot starting at `minute`, both ends included.
+    """
+    start = minute.time()
+    end = (minute + SLOT_WIDTH - timedelta(microseconds=1)).time()
+    return start, end
+
+
+def floor_minute(dt: datetime) -> datetime:
+    return dt.replace(second=0, microsecond=0)
+
+
+async def try_acquire_leadership(conn: psycopg.AsyncConnection) -> bool:
+    cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (SCHEDULER_LOCK_ID,))
+    return (await cur.fetchone())[0]
+
+
+async def run_scheduler(retry_delay: float = 60.0) -> None:
+    """
+    Send the due reminders of each user at their `notification_time`, until cancelled.
+
+    A timing wheel with one-minute slots: on every tick, only the users whose `notification_time`
+    falls in the current minute are scanned, through the index on `users (notification_time)`,
+    instead of every due event at once.
+
+    Only the worker holding the `SCHEDULER_LOCK_ID` advisory lock schedules. The lock belongs to
+    a dedicated connection, so it is released as soon as the leader dies and another worker takes over.
+    Slots missed since the last tick are caught up, up to `SCHEDULER_MAX_CATCH_UP` of them.
+    Reminders whose slot was missed otherwise wait for the next day, or for a `/reminder/run` sweep.
+    """
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(conninfo=DATABASE_URL, autocommit=True) as conn:
+                while not await try_acquire_leadership(conn):
+                    await asyncio.sleep(retry_delay)
+                logger.info("Reminder scheduler elected as leader")
+                last_slot = floor_minute(datetime.now(TZ_TAIPEI)) - SLOT_WIDTH
+                while True:
+                    # fails fast if the connection, and with it the lock, is lost
+                    await conn.execute("SELECT 1")
+                    current_slot = floor_minute(datetime.now(TZ_TAIPEI))
+                    slot = max(last_slot + SLOT_WIDTH, current_slot - SLOT_WIDTH * (SCHEDULER_MAX_CATCH_UP - 1))
+                    while slot <= current_slot:
+                        await run_reminders(notification_slot=get_slot(slot))
+                        last_slot = slot
+                        slot += SLOT_WIDTH
+                    next_tick = current_slot + SLOT_WIDTH
+                    await asyncio.sleep(max(0.0, (next_tick - datetime.now(TZ_TAIPEI)).total_seconds()))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning(f"Reminder scheduler failed, retrying in {retry_delay:.0f}s", exc_info=True)
+            await asyncio.sleep(retry_delay)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from linebot.v3 import WebhookParser
+from linebot.v3.webhooks import Event, MessageContent, MessageEvent
+
+from routine_bot.dedup import WebhookDeduplicator
+from routine_bot.fast_webhook import FastEvent, FastWebhookParser
+from routine_bot.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Event], Awaitable[None]]
+
+
+class AsyncWebhookHandler:
+    """
+    Coroutine counterpart of `linebot.v3.WebhookHandler`.
+
+    The SDK handler calls the registered functions synchronously, which would block the event loop
+    for the whole duration of the DB work. Handlers registered here are awaited instead.
+    Events recently handled by this worker are dropped by the `deduplicator` before any handler runs,
+    the handlers claim the others in their own transaction.
+    With `fast_path`, the events we handle are parsed into lightweight `FastEvent`s instead of SDK models.
+    """
+
+    def __init__(self, channel_secret: str, deduplicator: WebhookDeduplicator | None = None, fast_path: bool = False):
+        self.parser = WebhookParser(channel_secret)
+        self.fast_parser = FastWebhookParser(channel_secret) if fast_path else None
+        self.deduplicator = deduplicator
+        self._handlers: dict[tuple[type, type | None], EventHandler] = {}
+
+    def add(self, event: type[Event], message: type[MessageContent] | None = None):
+        def decorator(func: EventHandler) -> EventHandler:
+            self._handlers[(event, message)] = func
+            return func
+
+        return decorator
+
+    def parse(self, body: bytes, signature: str) -> list[Event | FastEvent]:
+        """
+        Verify the signature and parse the webhook body, raises `InvalidSignatureError` on mismatch.
+        """
+        if self.fast_parser is not None:
+            return self.fast_parser.parse(body, signature)
+        return self.parser.parse(body.decode("utf-8"), signature)
+
+    async def dispatch(self, event: Event | FastEvent) -> None:
+        func = None
+        if isinstance(event, FastEvent):
+            func = self._handlers.get(event.handler_key)
+        elif isinstance(event, MessageEvent):
+            func = self._handlers.get((type(event), type(event.message)))
+        if func is None:
+            func = self._handlers.get((type(event), None))
+        if func is None:
+            logger.debug(f"No handler for event type: {event.type}")
+            return
+        if self.deduplicator is not None and self.deduplicator.is_duplicate(event.webhook_event_id):
+            logger.info(f"Duplicate webhook event dropped: {event.webhook_event_id}")
+            return
+        await func(event)
+        if self.deduplicator is not None:
+            self.deduplicator.remember(event.webhook_event_id)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class WebhookQueue:
+    """
+    Bounded queue between the `/webhook` route and the event handlers.
+
+    The route only verifies and parses the body before handing the events over, so LINE gets its 200
+    right away. When the queue is full, the whole body is rejected so the route can shed load with a 503
+    instead of half-processing it.
+
+    Events are queued per `source.user_id`, and a pool of workers takes turns on the users with pending
+    events. A user is handed to one worker at a time, so their events are handled strictly in order,
+    while a slow event only holds up the events of its own user.
+    """
+
+    def __init__(self, handler: AsyncWebhookHandler, maxsize: int, workers: int):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.num_workers = workers
+        # pending events of each user, a user stays listed while one of their events is being handled
+        self._pending: dict[str, deque[tuple[float, Event]]] = {}
+        # users with pending events that no worker has taken yet
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self.depth = 0
+        self.latency = LatencyHistogram()
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.shed = 0
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.num_workers)]
+        logger.info(f"Webhook queue started: {self.num_workers} workers")
+
+    def submit(self, events: list[Event]) -> None:
+        if self.maxsize - self.depth < len(events):
+            self.shed += len(events)
+            raise QueueFullError(f"Webhook queue is full: {self.depth} events pending")
+        enqueued_at = time.monotonic()
+        for event in events:
+            user_id = getattr(event.source, "user_id", None) or ""
+            if user_id in self._pending:
+                self._pending[user_id].append((enqueued_at, event))
+            else:
+                self._pending[user_id] = deque([(enqueued_at, event)])
+                self._ready.put_nowait(user_id)
+        self.depth += len(events)
+        self.enqueued += len(events)
+
+    async def _work(self) -> None:
+        while True:
+            user_id = await self._ready.get()
+            events = self._pending[user_id]
+            enqueued_at, event = events.popleft()
+            self.depth -= 1
+            try:
+                await self.handler.dispatch(event)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(str(e), exc_info=True)
+            finally:
+                self.latency.observe(time.monotonic() - enqueued_at)
+                # back of the line, so a user with many events does not starve the others
+                if events:
+                    self._ready.put_nowait(user_id)
+                else:
+                    del self._pending[user_id]
+                self._ready.task_done()
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Wait for the queued events to be handled, then stop the workers.
+        """
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout=timeout)
+        except TimeoutError:
+            logger.warning(f"Webhook queue not drained in {timeout}s: {self.depth} events dropped")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        logger.info("Webhook queue stopped")
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_size": self.maxsize,
+            "workers": self.num_workers,
+            "users": len(self._pending),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "latency": self.latency.snapshot(),
+        }
@@ -0,0 +1,77 @@
+import pytest
+from fake_line import open_client
+
+import routine_bot.async_db as db
+import routine_bot.outbox as outbox
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("clean_db")]
+
+# (users, due events per user), from the many light users to the few heavy ones
+USERS = [(400, 1), (200, 3), (50, 12), (10, 40)]
+SHARE_EVERY = 4
+
+
+async def seed_due_events(conn) -> list[str]:
+    event_ids = []
+    for group, (users, events) in enumerate(USERS):
+        await conn.execute(
+            """
+            INSERT INTO users (user_id, display_name, picture_url)
+            SELECT 'U' || %s || '-' || i, 'user', 'https://example.com'
+            FROM generate_series(1, %s) AS i
+            """,
+            (group, users),
+        )
+        cur = await conn.execute(
+            """
+            INSERT INTO events (
+                event_id, event_name, user_id, last_done_at, reminder, reminder_cycle_count, reminder_cycle_unit,
+                next_reminder
+            )
+            SELECT 'E' || %(group)s || '-' || i || '-' || n, 'event ' || n, 'U' || %(group)s || '-' || i,
+                   NOW() - INTERVAL '8 day', TRUE, 1, 'week', NOW() - INTERVAL '1 day'
+            FROM generate_series(1, %(users)s) AS i, generate_series(1, %(events)s) AS n
+            RETURNING event_id
+            """,
+            {"group": group, "users": users, "events": events},
+        )
+        event_ids.extend(event_id for (event_id,) in await cur.fetchall())
+    # a few events are also shared with the first light user
+    await conn.execute(
+        """
+        INSERT INTO shares (share_id, event_id, event_name, owner_id, recipient_id)
+        SELECT 'S' || event_id, event_id, event_name, user_id, 'U0-1'
+        FROM events
+        WHERE hashtext(event_id) %% %s = 0 AND user_id <> 'U0-1'
+        """,
+        (SHARE_EVERY,),
+    )
+    return event_ids
+
+
+async def test_messages_sent_per_notification(pool, line_server, monkeypatch):
+    async with pool.connection() as conn:
+        event_ids = await seed_due_events(conn)
+        notifications = await db.enqueue_reminders(event_ids, conn)
+
+    client = await open_client(line_server)
+    monkeypatch.setattr(outbox, "line_client", client)
+    try:
+        summary = await outbox.drain_outbox()
+    finally:
+        await client.close()
+
+    pushes = line_server.requests["push"]
+    multicasts = line_server.requests["multicast"]
+    # LINE counts one message per recipient of a request, whatever the number of message objects in it
+    quota = len(pushes) + sum(len(request["body"]["to"]) for request in multicasts)
+    api_calls = len(pushes) + len(multicasts)
+
+    print(f"\n{notifications} notifications for {sum(users for users, _ in USERS)} users")
+    print(f"  before: {notifications} API calls, {notifications} messages counted (one push per notification)")
+    print(f"   after: {api_calls} API calls, {quota} messages counted", end=" ")
+    print(f"({len(pushes)} push, {len(multicasts)} multicast)")
+    print(f"   ratio: {notifications / api_calls:.1f}x fewer calls, {notifications / quota:.1f}x fewer messages")
+    assert summary.delivered == notifications
+    assert summary.api_calls == api_calls
+    assert api_calls < notifications
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+from linebot.v3.messaging import ReplyMessageRequest
+
+from routine_bot.messages import ErrorMsg, NewEventMsg
+
+pytestmark = pytest.mark.benchmark
+
+REPLIES = 1_000
+
+# (name, cached message factory, arguments)
+MESSAGES = [
+    ("unrecognized_command", ErrorMsg.unrecognized_command, ()),
+    ("event_name_duplicated", ErrorMsg.event_name_duplicated, ("brush teeth",)),
+    ("max_events_reached", ErrorMsg.max_events_reached, ()),
+    ("reminder_disabled", ErrorMsg.reminder_disabled, ()),
+    ("reminder_cycle_example", NewEventMsg.reminder_cycle_example, ()),
+]
+
+
+def microseconds_per_reply(build, args: tuple) -> tuple[float, float]:
+    """
+    CPU time of building the message alone, and of building it and serializing the reply request
+    the way the SDK does before sending it.
+    """
+    started_at = time.process_time()
+    for _ in range(REPLIES):
+        build(*args)
+    built_at = time.process_time()
+    for _ in range(REPLIES):
+        ReplyMessageRequest(reply_token="token", messages=[build(*args)]).to_json()
+    serialized_at = time.process_time()
+    return (built_at - started_at) / REPLIES * 1e6, (serialized_at - built_at) / REPLIES * 1e6
+
+
+def test_cpu_per_reply():
+    print(f"\nCPU per reply, mean of {REPLIES} replies, in µs")
+    print(f"{'message':>24}{'built':>8}{'cached':>8}{'built + json':>14}{'cached + json':>15}")
+    for name, factory, args in MESSAGES:
+        build, build_and_serialize = microseconds_per_reply(factory.__wrapped__, args)
+        cached, cached_and_serialize = microseconds_per_reply(factory, args)
+        print(f"{name:>24}{build:>8.1f}{cached:>8.1f}{build_and_serialize:>14.1f}{cached_and_serialize:>15.1f}")
+        assert cached < build
@@ -0,0 +1,72 @@
+import tracemalloc
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+
+import pytest
+
+from routine_bot.constants import TZ_TAIPEI
+from routine_bot.models import EventBatch, EventData
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = 100_000
+
+
+@dataclass
+class DictEventData:
+    """
+    `EventData` as it was before, backed by an instance `__dict__`.
+    """
+
+    event_id: str
+    event_name: str
+    user_id: str
+    last_done_at: datetime
+    reminder: bool
+    reminder_cycle_count: int | None = None
+    reminder_cycle_unit: str | None = None
+    next_reminder: datetime | None = None
+    last_notification_sent_at: datetime | None = None
+    share_count: int = 0
+
+
+def fetched_rows() -> list[tuple]:
+    """
+    Rows as psycopg hands them over, the field values are shared by every representation below.
+    """
+    now = datetime.now(TZ_TAIPEI)
+    return [
+        (f"event-{i}", "brush teeth", f"user-{i % 1000}", now - timedelta(days=8), True, 1, "week", now, None, 0)
+        for i in range(ROWS)
+    ]
+
+
+def bytes_per_row(build) -> float:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        built = build()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(built) == ROWS
+    return (after - before) / ROWS
+
+
+def test_memory_per_event_row():
+    rows = fetched_rows()
+    batch_columns = [
+        (event_id, user_id, last_done_at, count, unit, next_reminder)
+        for event_id, _, user_id, last_done_at, _, count, unit, next_reminder, _, _ in rows
+    ]
+    results = {
+        "dict-backed dataclass": bytes_per_row(lambda: [DictEventData(*row) for row in rows]),
+        "slotted EventData": bytes_per_row(lambda: [EventData(*row) for row in rows]),
+        "EventBatch columns": bytes_per_row(lambda: EventBatch.from_rows(batch_columns)),
+    }
+
+    print(f"\nMemory per event row, {ROWS} rows, excluding the field values themselves")
+    for name, size in results.items():
+        print(f"{name:>22}: {size:6.1f} B/row")
+    print(f"{'':>22}  {len(fields(EventData))} fields per EventData, {len(fields(EventBatch))} per EventBatch")
+    assert results["EventBatch columns"] < results["slotted EventData"] < results["dict-backed dataclass"]
@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+import psycopg
+import pytest
+import pytest_asyncio
+from helpers import add_user
+from linebot.v3.webhooks import PostbackEvent
+from psycopg_pool import AsyncConnectionPool
+
+import routine_bot.async_db as db
+from routine_bot.cache import chat_cache
+from routine_bot.fast_webhook import FastEvent, FastPostback, FastSource
+from routine_bot.handlers import get_reply_message_from_postback, get_reply_message_from_text
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("clean_db")]
+
+USERS = 20
+START_DATE = "start date"
+
+# The messages of each command flow, in order. `START_DATE` stands for the date picker postback.
+FLOWS = {
+    "greeting": ["hello"],
+    "/new": ["/new", "brush teeth", START_DATE, "設定提醒", "1 week"],
+    "/find": ["/find", "brush teeth"],
+    "/abort": ["/new", "/abort"],
+}
+
+
+class CountingCursor(psycopg.AsyncCursor):
+    """
+    Counts the statements sent by every connection of the pool it is set on.
+    """
+
+    statements = 0
+
+    async def execute(self, query, params=None, **kwargs):
+        CountingCursor.statements += 1
+        return await super().execute(query, params, **kwargs)
+
+
+@pytest_asyncio.fixture
+async def counting_pool(pool, database_url, monkeypatch):
+    """
+    Hand the handlers connections that count their statements, in place of the app pool.
+    """
+    counting = AsyncConnectionPool(
+        database_url, min_size=1, max_size=2, kwargs={"cursor_factory": CountingCursor}, open=False
+    )
+    await counting.open(wait=True)
+    monkeypatch.setattr(db, "pool", counting)
+    yield counting
+    await counting.close()
+
+
+def start_date_postback(user_id: str, chat_id: str, event_id: str) -> FastEvent:
+    return FastEvent(
+        handler_key=(PostbackEvent, None),
+        type="postback",
+        webhook_event_id=event_id,
+        source=FastSource(user_id=user_id),
+        postback=FastPostback(data=chat_id, params={"date": "2025-01-31"}),
+    )
+
+
+async def run_flows(user_id: str, pool, cold: bool) -> dict[tuple[str, int], int]:
+    """
+    Send the messages of every flow as `user_id`, and count the statements of each one.
+    With `cold`, the chat cache is emptied before every message, as after a restart or an eviction.
+    """
+    statements = {}
+    for flow, messages in FLOWS.items():
+        for step, msg in enumerate(messages):
+            event_id = f"{user_id}-{flow}-{step}"
+            if msg == START_DATE:
+                async with pool.connection() as conn:
+                    chat = await db.get_ongoing_chat(user_id, conn)
+                event = start_date_postback(user_id, chat.chat_id, event_id)
+            if cold:
+                chat_cache.clear()
+            before = CountingCursor.statements
+            if msg == START_DATE:
+                assert await get_reply_message_from_postback(event) is not None
+            else:
+                assert await get_reply_message_from_text(msg, user_id, webhook_event_id=event_id) is not None
+            statements[(flow, step)] = CountingCursor.statements - before
+    return statements
+
+
+async def test_queries_per_message(pool, counting_pool):
+    totals = {"warm": defaultdict(int), "cold": defaultdict(int)}
+    async with pool.connection() as conn:
+        for i in range(USERS):
+            for cache in totals:
+                await add_user(f"{cache}-{i}", conn)
+    for i in range(USERS):
+        for cache, total in totals.items():
+            for key, count in (await run_flows(f"{cache}-{i}", pool, cold=cache == "cold")).items():
+                total[key] += count
+
+    print(f"\nStatements per inbound message, mean of {USERS} users")
+    print(f"{'flow':>8}  {'message':<14}{'warm cache':>12}{'cold cache':>12}")
+    for flow, messages in FLOWS.items():
+        for step, msg in enumerate(messages):
+            warm, cold = totals["warm"][(flow, step)] / USERS, totals["cold"][(flow, step)] / USERS
+            print(f"{flow:>8}  {msg:<14}{warm:>12.1f}{cold:>12.1f}")
+    for flow, messages in FLOWS.items():
+        warm = sum(totals["warm"][(flow, step)] for step in range(len(messages))) / USERS
+        cold = sum(totals["cold"][(flow, step)] for step in range(len(messages))) / USERS
+        print(f"{flow:>8}  {'(whole flow)':<14}{warm:>12.1f}{cold:>12.1f}")
+    assert sum(totals["warm"].values()) < sum(totals["cold"].values())
@@ -0,0 +1,71 @@
+import time
+import uuid
+from datetime import datetime
+
+import psycopg
+import pytest
+from helpers import add_user, new_event_chat, next_xid
+
+import routine_bot.async_db as db
+from routine_bot.constants import TZ_TAIPEI
+from routine_bot.enums import ChatStatus, NewEventSteps
+from routine_bot.models import ChatData, EventData, UpdateData
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("clean_db")]
+
+STEPS = 200
+
+
+async def complete_new_event(chat: ChatData, conn: psycopg.AsyncConnection) -> None:
+    """
+    The writes of the last /new step, as issued by `handle_new_event_chat`.
+    """
+    chat.current_step = None
+    chat.status = ChatStatus.COMPLETED.value
+    event_id = str(uuid.uuid4())
+    done_at = datetime.now(TZ_TAIPEI)
+    await db.set_chat_state(chat, conn)
+    await db.add_event(EventData(event_id, chat.payload["event_name"], chat.user_id, done_at, False), conn)
+    update = UpdateData(str(uuid.uuid4()), event_id, chat.payload["event_name"], chat.user_id, done_at)
+    await db.add_update(update, conn)
+    await db.increment_user_event_count(chat.user_id, by=1, conn=conn)
+
+
+async def seed_chats(prefix: str, pool) -> list[ChatData]:
+    chats = []
+    async with pool.connection() as conn:
+        for i in range(STEPS):
+            user_id = f"{prefix}{i}"
+            await add_user(user_id, conn)
+            chat = new_event_chat(user_id, NewEventSteps.INPUT_TOGGLE_REMINDER)
+            await db.add_chat(chat, conn)
+            chats.append(chat)
+    return chats
+
+
+async def test_commits_per_step(pool, database_url):
+    results = {}
+    async with await psycopg.AsyncConnection.connect(database_url) as probe:
+        # before: every setter committed on its own
+        chats = await seed_chats("before-", pool)
+        async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as conn:
+            first_xid = await next_xid(probe)
+            started_at = time.perf_counter()
+            for chat in chats:
+                await complete_new_event(chat, conn)
+            results["before"] = (await next_xid(probe) - first_xid, time.perf_counter() - started_at)
+
+        # after: one unit of work per step
+        chats = await seed_chats("after-", pool)
+        async with await psycopg.AsyncConnection.connect(database_url) as conn:
+            first_xid = await next_xid(probe)
+            started_at = time.perf_counter()
+            for chat in chats:
+                async with db.unit_of_work(conn):
+                    await complete_new_event(chat, conn)
+            results["after"] = (await next_xid(probe) - first_xid, time.perf_counter() - started_at)
+
+    print(f"\nLast /new step, {STEPS} steps")
+    for name, (commits, duration) in results.items():
+        print(f"{name:>8}: {commits / STEPS:.2f} commits/step, {duration / STEPS * 1000:.3f} ms/step")
+    assert results["after"][0] == STEPS
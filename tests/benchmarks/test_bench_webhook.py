@@ -0,0 +1,40 @@
+import time
+from functools import partial
+
+import pytest
+from helpers import WEBHOOKS, sign
+from linebot.v3 import WebhookParser
+
+from routine_bot.fast_webhook import FastWebhookParser, json_loads
+
+pytestmark = pytest.mark.benchmark
+
+SECRET = "channel-secret"
+PARSES = 2_000
+
+
+def sdk_parse(parser: WebhookParser, body: bytes, signature: str) -> list:
+    # the SDK parser takes the body as text
+    return parser.parse(body.decode("utf-8"), signature)
+
+
+def microseconds_per_body(parse, body: bytes, signature: str) -> float:
+    started_at = time.process_time()
+    for _ in range(PARSES):
+        parse(body, signature)
+    return (time.process_time() - started_at) / PARSES * 1e6
+
+
+def test_parse_cost_per_webhook():
+    sdk_parser = WebhookParser(SECRET)
+    fast_parser = FastWebhookParser(SECRET)
+
+    print(f"\nCPU per webhook body, mean of {PARSES} parses, in µs, decoding with {json_loads.__module__}")
+    print(f"{'payload':>22}{'events':>8}{'SDK':>10}{'fast':>10}{'speedup':>10}")
+    for path in WEBHOOKS:
+        body = path.read_bytes()
+        signature = sign(body, SECRET)
+        sdk = microseconds_per_body(partial(sdk_parse, sdk_parser), body, signature)
+        fast = microseconds_per_body(fast_parser.parse, body, signature)
+        events = len(fast_parser.parse(body, signature))
+        print(f"{path.stem:>22}{events:>8}{sdk:>10.1f}{fast:>10.1f}{sdk / fast:>9.1f}x")
@@ -0,0 +1,71 @@
+import os
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+# Settings are read when `routine_bot.constants` is imported, so they are set before any `routine_bot` import.
+# Tests that need PostgreSQL run against `TEST_DATABASE_URL` and are skipped when it is not set.
+# The schema of that database is dropped and recreated on every run.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+os.environ.setdefault("LINE_CHANNEL_SECRET", "test-channel-secret")
+os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "test-access-token")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+from fake_line import FakeLineServer, open_client  # noqa: E402
+
+import routine_bot.async_db as db  # noqa: E402
+from routine_bot.cache import chat_cache  # noqa: E402
+from routine_bot.migrate import migrate  # noqa: E402
+
+TABLES = ("users", "chats", "events", "updates", "shares", "webhook_events", "outbox")
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+    with psycopg.connect(TEST_DATABASE_URL) as conn:
+        migrate(conn)
+    return TEST_DATABASE_URL
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def pool(database_url):
+    await db.pool.open(wait=True)
+    yield db.pool
+    await db.pool.close()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def clean_db(pool):
+    """
+    Empty every table and the chat cache before the test.
+    """
+    async with pool.connection() as conn:
+        await conn.execute(f"TRUNCATE {', '.join(TABLES)}")
+    chat_cache.clear()
+    yield pool
+    chat_cache.clear()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def line_server():
+    server = FakeLineServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def line_client(line_server):
+    """
+    A LINE client calling `line_server`.
+    """
+    client = await open_client(line_server)
+    yield client
+    await client.close()
@@ -0,0 +1,113 @@
+import asyncio
+from collections import defaultdict, deque
+from collections.abc import Callable
+
+from aiohttp import web
+
+from routine_bot.line_client import ENDPOINTS, LineClient
+
+PATHS = {
+    "/v2/bot/message/reply": "reply",
+    "/v2/bot/message/push": "push",
+    "/v2/bot/message/multicast": "multicast",
+}
+
+
+class FakeLineServer:
+    """
+    A local stand-in for the Messaging API endpoints the bot calls.
+
+    Every request is recorded in `requests`, and answered with the next scripted failure of its
+    endpoint if any, or with a success otherwise. `connections` counts the TCP connections opened.
+    `on_request` is called with the endpoint of every request, before it is answered.
+    Messages are answered after `delay` seconds.
+    """
+
+    def __init__(self):
+        self.requests: dict[str, list[dict]] = defaultdict(list)
+        self.failures: dict[str, deque[tuple[int, dict[str, str]]]] = defaultdict(deque)
+        self.fail_recipients: set[str] = set()
+        self.on_request: Callable[[str], None] | None = None
+        self.delay = 0.0
+        self._transports = set()
+        self._app = web.Application()
+        self._app.router.add_post("/v2/bot/message/{kind}", self._message)
+        self._app.router.add_get("/v2/bot/profile/{user_id}", self._profile)
+        self._runner = web.AppRunner(self._app)
+        self.url = ""
+
+    @property
+    def connections(self) -> int:
+        return len(self._transports)
+
+    def fail(self, endpoint: str, status: int, headers: dict[str, str] | None = None, times: int = 1) -> None:
+        for _ in range(times):
+            self.failures[endpoint].append((status, headers or {}))
+
+    async def start(self) -> None:
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def _failure(self, endpoint: str) -> web.Response | None:
+        if not self.failures[endpoint]:
+            return None
+        status, headers = self.failures[endpoint].popleft()
+        return web.json_response({"message": "scripted failure"}, status=status, headers=headers)
+
+    async def _message(self, request: web.Request) -> web.Response:
+        self._transports.add(request.transport)
+        endpoint = PATHS[request.path]
+        body = await request.json()
+        self.requests[endpoint].append({"body": body, "retry_key": request.headers.get("X-Line-Retry-Key")})
+        if self.on_request is not None:
+            self.on_request(endpoint)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        failure = self._failure(endpoint)
+        if failure is not None:
+            return failure
+        recipients = body["to"] if isinstance(body.get("to"), list) else [body.get("to")]
+        if self.fail_recipients.intersection(recipients):
+            return web.json_response({"message": "The user hasn't added the LINE Official Account"}, status=400)
+        if endpoint == "multicast":
+            return web.json_response({})
+        sent = [{"id": str(i), "quoteToken": "q"} for i in range(len(body["messages"]))]
+        return web.json_response({"sentMessages": sent})
+
+    async def _profile(self, request: web.Request) -> web.Response:
+        self._transports.add(request.transport)
+        user_id = request.match_info["user_id"]
+        self.requests["profile"].append({"user_id": user_id})
+        if self.on_request is not None:
+            self.on_request("profile")
+        failure = self._failure("profile")
+        if failure is not None:
+            return failure
+        return web.json_response(
+            {"userId": user_id, "displayName": f"name of {user_id}", "pictureUrl": f"https://example.com/{user_id}"}
+        )
+
+
+async def open_client(server: FakeLineServer, **kwargs) -> LineClient:
+    """
+    A `LineClient` calling `server`, without rate limits and with short backoffs unless overridden.
+    """
+    options = {
+        "pool_size": 4,
+        "timeout": 5,
+        "rate_limits": dict.fromkeys(ENDPOINTS, 1_000_000),
+        "max_retries": 3,
+        "backoff_base": 0.001,
+        "backoff_cap": 0.01,
+        **kwargs,
+    }
+    client = LineClient("token", **options)
+    await client.open()
+    client.api.line_base_path = server.url
+    return client
@@ -0,0 +1,54 @@
+import base64
+import hashlib
+import hmac
+from datetime import datetime
+from pathlib import Path
+
+import psycopg
+
+import routine_bot.async_db as db
+from routine_bot.constants import TZ_TAIPEI
+from routine_bot.enums import ChatType, NewEventSteps
+from routine_bot.models import ChatData
+
+# Webhook bodies as LINE sends them, one file per scenario.
+WEBHOOKS = sorted((Path(__file__).parent / "data" / "webhooks").glob("*.json"))
+
+
+async def next_xid(conn: psycopg.AsyncConnection) -> int:
+    """
+    The next transaction ID to be assigned, without assigning one.
+    Every committed write transaction consumes one, so the difference between two calls counts them.
+    """
+    cur = await conn.execute("SELECT pg_snapshot_xmax(pg_current_snapshot())::text::bigint")
+    (xid,) = await cur.fetchone()
+    await conn.commit()
+    return xid
+
+
+async def add_user(user_id: str, conn: psycopg.AsyncConnection) -> None:
+    await db.add_user(user_id, f"name of {user_id}", f"https://example.com/{user_id}.png", conn)
+
+
+def new_event_chat(user_id: str, step: NewEventSteps, event_name: str = "brush teeth") -> ChatData:
+    """
+    A /new chat at `step`, with the payload collected by the previous steps.
+    """
+    chat_id = f"chat-of-{user_id}"
+    payload = {"event_name": event_name, "chat_id": chat_id}
+    if step in (NewEventSteps.INPUT_TOGGLE_REMINDER, NewEventSteps.INPUT_REMINDER_CYCLE):
+        payload["start_date"] = datetime(2025, 1, 31, tzinfo=TZ_TAIPEI).isoformat()
+    return ChatData(
+        chat_id=chat_id,
+        user_id=user_id,
+        chat_type=ChatType.NEW_EVENT.value,
+        current_step=step.value,
+        payload=payload,
+    )
+
+
+def sign(body: bytes, channel_secret: str) -> str:
+    """
+    The `X-Line-Signature` LINE would send along `body`.
+    """
+    return base64.b64encode(hmac.new(channel_secret.encode("utf-8"), body, hashlib.sha256).digest()).decode("utf-8")
@@ -0,0 +1,136 @@
+import copy
+
+import psycopg
+import pytest
+from helpers import add_user, new_event_chat
+
+import routine_bot.async_db as db
+from routine_bot.cache import chat_cache
+from routine_bot.enums import ChatStatus, NewEventSteps
+from routine_bot.handlers import get_reply_message_from_text
+from routine_bot.messages import ErrorMsg
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+
+async def get_chat_row(chat_id: str, conn: psycopg.AsyncConnection) -> tuple:
+    cur = await conn.execute("SELECT current_step, payload, status, version FROM chats WHERE chat_id = %s", (chat_id,))
+    return await cur.fetchone()
+
+
+async def advance_elsewhere(chat, conn: psycopg.AsyncConnection) -> None:
+    """
+    Write the next step of the chat the way another worker would, leaving this worker's cache untouched.
+    """
+    chat = copy.deepcopy(chat)
+    chat.payload["start_date"] = "2025-01-31T00:00:00+08:00"
+    chat.current_step = NewEventSteps.INPUT_TOGGLE_REMINDER.value
+    await db.set_chat_state(chat, conn)
+
+
+async def test_write_bumps_the_version(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_NAME)
+        await db.add_chat(chat, conn)
+        chat.current_step = NewEventSteps.INPUT_START_DATE.value
+        await db.set_chat_state(chat, conn)
+        await db.set_chat_state(chat, conn)
+        assert chat.version == 2
+        assert (await get_chat_row(chat.chat_id, conn))[3] == 2
+
+
+async def test_write_based_on_a_stale_copy_is_rejected(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_START_DATE)
+        await db.add_chat(chat, conn)
+        await advance_elsewhere(chat, conn)
+
+        chat.status = ChatStatus.ABORTED.value
+        with pytest.raises(db.StaleChatError):
+            await db.set_chat_state(chat, conn)
+        assert await get_chat_row(chat.chat_id, conn) == (
+            NewEventSteps.INPUT_TOGGLE_REMINDER,
+            {"event_name": "brush teeth", "chat_id": chat.chat_id, "start_date": "2025-01-31T00:00:00+08:00"},
+            ChatStatus.ONGOING,
+            1,
+        )
+
+
+async def test_stale_cached_chat_is_reread_and_the_step_redone(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_START_DATE)
+        await db.add_chat(chat, conn)
+    stale = copy.deepcopy(chat)
+    async with pool.connection() as conn:
+        await advance_elsewhere(chat, conn)
+    # the invalidation from the other worker has not arrived yet
+    chat_cache.set("U1", stale)
+
+    await get_reply_message_from_text("/abort", "U1")
+
+    async with pool.connection() as conn:
+        current_step, payload, status, version = await get_chat_row(chat.chat_id, conn)
+    # aborted on top of the other worker's write instead of overwriting it
+    assert status == ChatStatus.ABORTED
+    assert payload["start_date"] == "2025-01-31T00:00:00+08:00"
+    assert version == 2
+
+
+async def test_stale_cached_chat_in_a_unit_of_work_is_retried(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_TOGGLE_REMINDER)
+        await db.add_chat(chat, conn)
+    stale = copy.deepcopy(chat)
+    async with pool.connection() as conn:
+        # another worker aborted the chat
+        chat.status = ChatStatus.ABORTED.value
+        await db.set_chat_state(chat, conn)
+    chat_cache.set("U1", stale)
+
+    await get_reply_message_from_text("不設定提醒", "U1")
+
+    async with pool.connection() as conn:
+        # no event was created for the aborted chat
+        assert await db.get_event_id("U1", "brush teeth", conn) is None
+        assert (await db.get_user("U1", conn)).event_count == 0
+    assert chat_cache.get("U1") is None
+
+
+async def add_event(event_name: str, user_id: str, conn: psycopg.AsyncConnection) -> None:
+    await conn.execute(
+        """
+        INSERT INTO events (event_id, event_name, user_id, last_done_at, reminder)
+        VALUES ('E-' || %(name)s, %(name)s, %(user_id)s, NOW(), FALSE)
+        """,
+        {"name": event_name, "user_id": user_id},
+    )
+
+
+async def test_events_are_found_by_name(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await add_event("brush teeth", "U1", conn)
+
+    await get_reply_message_from_text("/find", "U1")
+    assert await get_reply_message_from_text("floss", "U1") == ErrorMsg.event_name_not_found("floss")
+    summary = await get_reply_message_from_text("brush teeth", "U1")
+
+    assert "brush teeth" in summary.alt_text
+    async with pool.connection() as conn:
+        event = await db.get_event_by_name("U1", "brush teeth", conn)
+        assert (event.event_id, event.user_id) == ("E-brush teeth", "U1")
+        assert await db.get_event_by_name("U2", "brush teeth", conn) is None
+
+
+async def test_new_event_name_must_be_unused(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await add_event("brush teeth", "U1", conn)
+
+    await get_reply_message_from_text("/new", "U1")
+
+    assert await get_reply_message_from_text("brush teeth", "U1") == ErrorMsg.event_name_duplicated("brush teeth")
@@ -0,0 +1,74 @@
+import psycopg
+import pytest
+from helpers import WEBHOOKS, add_user, new_event_chat, sign
+from linebot.v3 import WebhookParser
+
+import routine_bot.async_db as db
+import routine_bot.handlers as handlers
+from routine_bot.enums import NewEventSteps
+from routine_bot.handlers import get_reply_message_from_text
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+
+async def count_rows(table: str, conn: psycopg.AsyncConnection) -> int:
+    cur = await conn.execute(f"SELECT COUNT(*) FROM {table}")
+    (count,) = await cur.fetchone()
+    return count
+
+
+async def test_redelivered_event_is_dropped(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+
+    assert await get_reply_message_from_text("/new", "U1", webhook_event_id="W1") is not None
+    # handled as the event name of the new chat if it were not dropped
+    assert await get_reply_message_from_text("/new", "U1", webhook_event_id="W1") is None
+
+    async with pool.connection() as conn:
+        assert await count_rows("chats", conn) == 1
+        assert await count_rows("webhook_events", conn) == 1
+
+
+async def test_redelivery_of_a_failed_event_is_handled(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await db.add_chat(new_event_chat("U1", NewEventSteps.INPUT_TOGGLE_REMINDER), conn)
+        # the event name was free when it was entered, but is taken by now
+        await conn.execute(
+            """
+            INSERT INTO events (event_id, event_name, user_id, last_done_at, reminder)
+            VALUES ('E0', 'brush teeth', 'U1', NOW(), FALSE)
+            """
+        )
+
+    with pytest.raises(psycopg.errors.UniqueViolation):
+        await get_reply_message_from_text("不設定提醒", "U1", webhook_event_id="W1")
+    async with pool.connection() as conn:
+        # the claim was rolled back with the writes
+        assert await count_rows("webhook_events", conn) == 0
+        await conn.execute("DELETE FROM events WHERE event_id = 'E0'")
+
+    assert await get_reply_message_from_text("不設定提醒", "U1", webhook_event_id="W1") is not None
+    async with pool.connection() as conn:
+        assert await db.get_event_id("U1", "brush teeth", conn) is not None
+        assert await count_rows("webhook_events", conn) == 1
+
+
+async def test_follow_is_handled_once_without_holding_a_connection(pool, line_server, line_client, monkeypatch):
+    monkeypatch.setattr(handlers, "line_client", line_client)
+    in_use = []
+    line_server.on_request = lambda endpoint: in_use.append((endpoint, db.get_pool_stats()["in_use"]))
+    (path,) = [path for path in WEBHOOKS if path.stem == "follow"]
+    body = path.read_bytes()
+    (event,) = WebhookParser("secret").parse(body.decode("utf-8"), sign(body, "secret"))
+
+    await handlers.handle_user_added(event)
+    await handlers.handle_user_added(event)
+
+    # the redelivery is dropped once the profile is fetched, before replying
+    assert in_use == [("profile", 0), ("reply", 0), ("profile", 0)]
+    async with pool.connection() as conn:
+        user = await db.get_user(event.source.user_id, conn)
+        assert user.display_name == f"name of {event.source.user_id}"
+        assert await count_rows("webhook_events", conn) == 1
@@ -0,0 +1,69 @@
+from linebot.v3.messaging import TextMessage
+
+from routine_bot.delivery import DeliveryBatch
+
+
+def message(key: str) -> TextMessage:
+    return TextMessage(text=f"reminder {key}")
+
+
+def texts(request: dict) -> list[str]:
+    return [message["text"] for message in request["body"]["messages"]]
+
+
+async def test_messages_of_a_recipient_are_packed_by_five(line_server, line_client):
+    batch = DeliveryBatch()
+    for key in "ABCDEFG":
+        batch.add(key, message(key), ["U1"])
+
+    outcomes = await batch.send(line_client)
+
+    first, second = line_server.requests["push"]
+    assert texts(first) == [f"reminder {key}" for key in "ABCDE"]
+    assert texts(second) == ["reminder F", "reminder G"]
+    assert batch.api_calls == 2
+    assert len(outcomes) == 7
+    assert all(outcome.delivered for outcome in outcomes)
+
+
+async def test_recipients_of_the_same_messages_share_multicasts_of_500(line_server, line_client):
+    recipient_ids = [f"U{i}" for i in range(1200)]
+    batch = DeliveryBatch()
+    batch.add("A", message("A"), recipient_ids)
+    batch.add("B", message("B"), recipient_ids)
+
+    await batch.send(line_client)
+
+    assert not line_server.requests["push"]
+    requests = line_server.requests["multicast"]
+    assert [len(request["body"]["to"]) for request in requests] == [500, 500, 200]
+    assert all(texts(request) == ["reminder A", "reminder B"] for request in requests)
+    assert batch.api_calls == 3
+
+
+async def test_single_recipient_is_pushed(line_server, line_client):
+    batch = DeliveryBatch()
+    batch.add("A", message("A"), ["U1", "U2"])
+    batch.add("B", message("B"), ["U2"])
+
+    await batch.send(line_client)
+
+    # U1 and U2 do not get the same messages, so each of them gets a push
+    assert not line_server.requests["multicast"]
+    pushed = {request["body"]["to"]: texts(request) for request in line_server.requests["push"]}
+    assert pushed == {"U1": ["reminder A"], "U2": ["reminder A", "reminder B"]}
+    assert batch.api_calls == 2
+
+
+async def test_failed_request_only_fails_its_recipients(line_server, line_client):
+    line_server.fail_recipients.add("U2")
+    batch = DeliveryBatch()
+    batch.add("A", message("A"), ["U1", "U3"])
+    batch.add("B", message("B"), ["U2"])
+
+    outcomes = await batch.send(line_client)
+
+    delivered = {(outcome.recipient_id, outcome.key): outcome.delivered for outcome in outcomes}
+    assert delivered == {("U1", "A"): True, ("U3", "A"): True, ("U2", "B"): False}
+    (failure,) = [outcome for outcome in outcomes if not outcome.delivered]
+    assert failure.error is not None
@@ -0,0 +1,82 @@
+import asyncio
+
+import psycopg
+import pytest
+from helpers import add_user
+
+import routine_bot.async_db as db
+from routine_bot.constants import FREE_PLAN_MAX_EVENTS
+from routine_bot.entitlement import sweep_periodically
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+
+async def is_limited(user_id: str, conn: psycopg.AsyncConnection) -> bool:
+    return (await db.get_user(user_id, conn)).is_limited
+
+
+async def set_premium_until(user_id: str, interval: str, conn: psycopg.AsyncConnection) -> None:
+    """
+    Grant or expire premium access the way it is done outside of the bot.
+    """
+    await conn.execute(
+        "UPDATE users SET is_premium = TRUE, premium_until = NOW() + %s::interval WHERE user_id = %s",
+        (interval, user_id),
+    )
+
+
+async def test_crossing_the_free_plan_limit_limits_the_user(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await db.increment_user_event_count("U1", FREE_PLAN_MAX_EVENTS, conn)
+        assert not await is_limited("U1", conn)
+
+        await db.increment_user_event_count("U1", 1, conn)
+        assert await is_limited("U1", conn)
+
+        await db.increment_user_event_count("U1", -1, conn)
+        assert not await is_limited("U1", conn)
+
+
+async def test_premium_access_unlimits_the_user(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await db.increment_user_event_count("U1", FREE_PLAN_MAX_EVENTS + 1, conn)
+        await set_premium_until("U1", "30 day", conn)
+
+        assert await db.refresh_premium_limits(conn) == (0, 1)
+        assert not await is_limited("U1", conn)
+        # more events are allowed while premium access lasts
+        await db.increment_user_event_count("U1", 1, conn)
+        assert not await is_limited("U1", conn)
+
+
+async def test_sweeper_limits_the_user_once_premium_access_expires(pool):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await add_user("U2", conn)
+        await set_premium_until("U1", "30 day", conn)
+        await set_premium_until("U2", "30 day", conn)
+        await db.increment_user_event_count("U1", FREE_PLAN_MAX_EVENTS + 1, conn)
+        await db.increment_user_event_count("U2", FREE_PLAN_MAX_EVENTS, conn)
+        assert not await is_limited("U1", conn)
+        await set_premium_until("U1", "-1 second", conn)
+        await set_premium_until("U2", "-1 second", conn)
+        # an expiry writes nothing, the flag is stale until the sweep
+        assert not await is_limited("U1", conn)
+
+    sweeper = asyncio.create_task(sweep_periodically(0.01))
+    try:
+        async with asyncio.timeout(5):
+            while True:
+                await asyncio.sleep(0.01)
+                async with pool.connection() as conn:
+                    if await is_limited("U1", conn):
+                        break
+    finally:
+        sweeper.cancel()
+        await asyncio.gather(sweeper, return_exceptions=True)
+
+    async with pool.connection() as conn:
+        # within the free plan limit without premium access
+        assert not await is_limited("U2", conn)
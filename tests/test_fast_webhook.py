@@ -0,0 +1,60 @@
+import pytest
+from helpers import WEBHOOKS, sign
+from linebot.v3 import WebhookParser
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.webhooks import MessageEvent
+
+from routine_bot.fast_webhook import FastEvent, FastWebhookParser
+
+SECRET = "channel-secret"
+
+
+def handler_key(event) -> tuple[type, type | None]:
+    """
+    The key the SDK event would be dispatched under, see `AsyncWebhookHandler.dispatch`.
+    """
+    if isinstance(event, MessageEvent):
+        return type(event), type(event.message)
+    return type(event), None
+
+
+@pytest.mark.parametrize("path", WEBHOOKS, ids=lambda path: path.stem)
+def test_fast_events_match_the_sdk_events(path):
+    body = path.read_bytes()
+    signature = sign(body, SECRET)
+    fast_events = FastWebhookParser(SECRET).parse(body, signature)
+    sdk_events = WebhookParser(SECRET).parse(body.decode("utf-8"), signature)
+
+    assert len(fast_events) == len(sdk_events)
+    for fast, sdk in zip(fast_events, sdk_events):
+        if not isinstance(fast, FastEvent):
+            # no fast path, the SDK model is used as is
+            assert fast == sdk
+            continue
+        assert fast.handler_key == handler_key(sdk)
+        assert fast.type == sdk.type
+        assert fast.webhook_event_id == sdk.webhook_event_id
+        assert fast.source.user_id == sdk.source.user_id
+        assert fast.reply_token == getattr(sdk, "reply_token", None)
+        if fast.message is not None:
+            assert fast.message.text == sdk.message.text
+        if fast.postback is not None:
+            assert (fast.postback.data, fast.postback.params) == (sdk.postback.data, sdk.postback.params)
+
+
+def test_sticker_falls_back_to_the_sdk_model():
+    (path,) = [path for path in WEBHOOKS if path.stem == "sticker"]
+    body = path.read_bytes()
+
+    (event,) = FastWebhookParser(SECRET).parse(body, sign(body, SECRET))
+
+    assert isinstance(event, MessageEvent)
+
+
+def test_invalid_signature_is_rejected():
+    body = WEBHOOKS[0].read_bytes()
+
+    with pytest.raises(InvalidSignatureError):
+        FastWebhookParser(SECRET).parse(body, sign(body, "another-secret"))
+    with pytest.raises(InvalidSignatureError):
+        FastWebhookParser(SECRET).parse(body + b" ", sign(body, SECRET))
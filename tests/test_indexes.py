@@ -0,0 +1,122 @@
+from datetime import time
+
+import psycopg
+import pytest_asyncio
+from psycopg import sql
+
+import routine_bot.async_db as db
+
+USERS = 20_000
+EVENTS_PER_USER = 10
+UPDATES_PER_EVENT = 2
+
+
+class ExplainingCursor(psycopg.AsyncCursor):
+    """
+    Records the plan of every query before running it, so the data functions are checked as they are.
+    """
+
+    plans: list[dict]
+
+    async def execute(self, query, params=None, **kwargs):
+        if not isinstance(query, sql.Composable):
+            query = sql.SQL(query)
+        await super().execute(sql.SQL("EXPLAIN (FORMAT JSON) ") + query, params, **kwargs)
+        (plan,) = await self.fetchone()
+        self.connection.plans.append(plan[0]["Plan"])
+        return await super().execute(query, params, **kwargs)
+
+
+def scans(plan: dict) -> list[tuple[str, str]]:
+    found = [(plan["Node Type"], plan.get("Relation Name"))] if "Scan" in plan["Node Type"] else []
+    for child in plan.get("Plans", []):
+        found.extend(scans(child))
+    return found
+
+
+def assert_no_seq_scan(plans: list[dict]) -> None:
+    assert plans
+    for plan in plans:
+        seq_scans = [relation for node, relation in scans(plan) if node == "Seq Scan"]
+        assert not seq_scans, f"Seq Scan on {seq_scans}"
+
+
+@pytest_asyncio.fixture(scope="module")
+async def seeded(pool):
+    """
+    A few due events among many that are not, each with an update history.
+
+    Sized so the planner weighs the tables as it would in production. With much fewer users,
+    hashing the whole users table is cheaper than probing its primary key for each due event.
+    """
+    async with pool.connection() as conn:
+        await conn.execute("TRUNCATE users, chats, events, updates, shares, webhook_events, outbox")
+        await conn.execute(
+            """
+            INSERT INTO users (user_id, display_name, picture_url, notification_time, event_count, is_limited)
+            SELECT 'U' || i, 'user', 'https://example.com', make_time(i %% 24, i %% 60, 0), %(events)s, i %% 10 = 0
+            FROM generate_series(1, %(users)s) AS i
+            """,
+            {"users": USERS, "events": EVENTS_PER_USER},
+        )
+        await conn.execute(
+            """
+            INSERT INTO events (
+                event_id, event_name, user_id, last_done_at, reminder, reminder_cycle_count, reminder_cycle_unit,
+                next_reminder
+            )
+            SELECT 'E' || u || '-' || n, 'event ' || n, 'U' || u, NOW() - INTERVAL '1 day', n %% 3 > 0, 1, 'week',
+                   CASE WHEN (u + n) %% 100 = 0 THEN NOW() - INTERVAL '1 hour' ELSE NOW() + INTERVAL '6 day' END
+            FROM generate_series(1, %(users)s) AS u, generate_series(1, %(events)s) AS n
+            """,
+            {"users": USERS, "events": EVENTS_PER_USER},
+        )
+        await conn.execute(
+            """
+            INSERT INTO updates (update_id, event_id, event_name, user_id, done_at)
+            SELECT e.event_id || '-' || k, e.event_id, e.event_name, e.user_id, NOW() - k * INTERVAL '1 day'
+            FROM events e, generate_series(1, %s) AS k
+            """,
+            (UPDATES_PER_EVENT,),
+        )
+        await conn.execute(
+            """
+            INSERT INTO shares (share_id, event_id, event_name, owner_id, recipient_id)
+            SELECT 'S' || event_id, event_id, event_name, user_id, 'U1'
+            FROM events
+            WHERE event_id LIKE '%-1'
+            """
+        )
+        await conn.execute("ANALYZE")
+    yield
+
+
+@pytest_asyncio.fixture
+async def explaining_conn(seeded, database_url):
+    async with await psycopg.AsyncConnection.connect(database_url, cursor_factory=ExplainingCursor) as conn:
+        conn.plans = []
+        yield conn
+        await conn.rollback()
+
+
+async def test_due_reminder_scan_uses_indexes(explaining_conn):
+    batch = await db.claim_due_reminders(("-infinity", ""), 500, explaining_conn)
+    assert len(batch) > 0
+    assert_no_seq_scan(explaining_conn.plans)
+
+
+async def test_due_reminder_slot_scan_uses_indexes(explaining_conn):
+    await db.claim_due_reminders(("-infinity", ""), 500, explaining_conn, (time(8, 0), time(8, 59)))
+    assert_no_seq_scan(explaining_conn.plans)
+
+
+async def test_recent_update_times_use_indexes(explaining_conn):
+    done_at = await db.get_event_recent_update_times("E42-7", explaining_conn)
+    assert len(done_at) == UPDATES_PER_EVENT
+    assert_no_seq_scan(explaining_conn.plans)
+
+
+async def test_share_lookups_use_indexes(explaining_conn):
+    # the owners of both events, and the recipient of the shared one
+    assert await db.enqueue_reminders(["E42-1", "E43-2"], explaining_conn) == 3
+    assert_no_seq_scan(explaining_conn.plans)
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from helpers import add_user, new_event_chat
+
+import routine_bot.async_db as db
+from routine_bot.enums import NewEventSteps
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+ROOT = Path(__file__).parents[1]
+
+# Another worker: caches a chat for each user given on the command line, runs the invalidation listener,
+# and once the last user's chat is evicted, reports the users whose chat is still cached.
+WORKER = """
+import asyncio
+import sys
+
+from routine_bot.cache import chat_cache
+from routine_bot.invalidation import listen
+
+
+async def main(user_ids):
+    chat_cache.set("probe", True)
+    listener = asyncio.create_task(listen())
+    # the caches are cleared once the listener is connected
+    while chat_cache.get("probe") is not None:
+        await asyncio.sleep(0.01)
+    for user_id in user_ids:
+        chat_cache.set(user_id, "chat")
+    print("ready", flush=True)
+    async with asyncio.timeout(10):
+        while chat_cache.get(user_ids[-1]) is not None:
+            await asyncio.sleep(0.01)
+    print("cached:", ",".join(user_id for user_id in user_ids if chat_cache.get(user_id) is not None), flush=True)
+    listener.cancel()
+
+
+asyncio.run(main(sys.argv[1:]))
+"""
+
+
+async def start_worker(database_url: str, *user_ids: str) -> asyncio.subprocess.Process:
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), str(ROOT)])}
+    worker = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", WORKER, *user_ids, env=env, stdout=asyncio.subprocess.PIPE
+    )
+    assert await read_line(worker) == "ready"
+    return worker
+
+
+async def read_line(worker: asyncio.subprocess.Process) -> str:
+    async with asyncio.timeout(15):
+        return (await worker.stdout.readline()).decode().strip()
+
+
+async def add_chats(pool, *user_ids: str) -> list:
+    chats = []
+    async with pool.connection() as conn:
+        for user_id in user_ids:
+            await add_user(user_id, conn)
+            chat = new_event_chat(user_id, NewEventSteps.INPUT_NAME)
+            await db.add_chat(chat, conn)
+            chats.append(chat)
+    return chats
+
+
+async def test_write_evicts_the_chat_cached_by_another_worker(pool, database_url):
+    (chat,) = await add_chats(pool, "U1")
+    worker = await start_worker(database_url, "U1")
+
+    chat.current_step = NewEventSteps.INPUT_START_DATE.value
+    async with pool.connection() as conn:
+        await db.set_chat_state(chat, conn)
+
+    assert await read_line(worker) == "cached:"
+    assert await worker.wait() == 0
+
+
+async def test_rolled_back_write_does_not_evict(pool, database_url):
+    chat_1, chat_2 = await add_chats(pool, "U1", "U2")
+    worker = await start_worker(database_url, "U1", "U2")
+
+    async with pool.connection() as conn:
+        async with conn.transaction(force_rollback=True):
+            await db.set_chat_state(chat_1, conn)
+        # notifications are delivered in commit order, so U1's would have arrived first
+        await db.set_chat_state(chat_2, conn)
+
+    assert await read_line(worker) == "cached: U1"
+    assert await worker.wait() == 0
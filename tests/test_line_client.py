@@ -0,0 +1,70 @@
+import pytest
+from linebot.v3.messaging import ApiException, TextMessage
+
+from routine_bot.ratelimit import RetryBudget
+
+MESSAGES = [TextMessage(text="hello")]
+
+
+async def test_reply(line_server, line_client):
+    await line_client.reply("token-1", MESSAGES)
+
+    (request,) = line_server.requests["reply"]
+    assert request["body"]["replyToken"] == "token-1"
+    assert request["body"]["messages"] == [{"type": "text", "text": "hello"}]
+    assert line_client.stats()["reply"]["latency"]["count"] == 1
+    assert line_client.stats()["reply"]["errors"] == 0
+
+
+async def test_rate_limited_push_is_retried_after_the_requested_delay(line_server, line_client):
+    line_server.fail("push", 429, {"Retry-After": "0.05"}, times=2)
+
+    await line_client.push("U1", MESSAGES)
+
+    requests = line_server.requests["push"]
+    assert len(requests) == 3
+    # LINE drops the retries of a message it already accepted
+    assert len({request["retry_key"] for request in requests}) == 1
+    stats = line_client.stats()["push"]
+    assert stats["retries"] == 2
+    assert stats["backoff_seconds"] >= 0.1
+    assert stats["errors"] == 0
+
+
+async def test_client_error_is_not_retried(line_server, line_client):
+    line_server.fail("multicast", 400)
+
+    with pytest.raises(ApiException) as e:
+        await line_client.multicast(["U1", "U2"], MESSAGES)
+
+    assert e.value.status == 400
+    assert len(line_server.requests["multicast"]) == 1
+    assert line_client.stats()["multicast"]["errors"] == 1
+
+
+async def test_retries_stop_once_the_budget_is_spent(line_server, line_client):
+    line_server.fail("push", 500, times=3)
+    budget = RetryBudget(1)
+
+    with pytest.raises(ApiException):
+        await line_client.push("U1", MESSAGES, budget=budget)
+
+    assert len(line_server.requests["push"]) == 2
+    assert budget.used == 1
+
+
+async def test_get_profile(line_server, line_client):
+    profile = await line_client.get_profile("U1")
+
+    assert profile.display_name == "name of U1"
+    assert profile.picture_url == "https://example.com/U1"
+    assert line_server.requests["profile"] == [{"user_id": "U1"}]
+
+
+async def test_connections_are_reused(line_server, line_client):
+    for i in range(10):
+        await line_client.reply(f"token-{i}", MESSAGES)
+    await line_client.get_profile("U1")
+
+    assert len(line_server.requests["reply"]) == 10
+    assert line_server.connections == 1
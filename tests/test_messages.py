@@ -0,0 +1,22 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from routine_bot.constants import TZ_TAIPEI
+from routine_bot.messages import ReminderMsg
+from routine_bot.models import EventData
+
+
+def test_due_bubble_is_reused_across_reminders():
+    last_done_at = datetime(2025, 1, 31, 8, 0, tzinfo=TZ_TAIPEI)
+    event = EventData("E1", "brush teeth", "U1", last_done_at, True, 1, "week", last_done_at + timedelta(weeks=1))
+    # the next reminder of the same event, a week later
+    next_event = replace(
+        event,
+        next_reminder=event.next_reminder + timedelta(weeks=1),
+        last_notification_sent_at=event.next_reminder,
+    )
+
+    done_again = replace(event, last_done_at=last_done_at + timedelta(days=1))
+
+    assert ReminderMsg.event_due_bubble(next_event) is ReminderMsg.event_due_bubble(event)
+    assert ReminderMsg.event_due_bubble(done_again) is not ReminderMsg.event_due_bubble(event)
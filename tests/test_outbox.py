@@ -0,0 +1,181 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import psycopg
+import pytest
+import pytest_asyncio
+from fake_line import open_client
+from helpers import add_user
+
+import routine_bot.async_db as db
+import routine_bot.outbox as outbox
+from routine_bot.enums import OutboxStatus
+from routine_bot.reminder import run_reminders
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+LEASE_TOKEN = str(uuid.uuid4())
+FIRST_TOKEN = str(uuid.uuid4())
+SECOND_TOKEN = str(uuid.uuid4())
+
+
+@pytest_asyncio.fixture
+async def sender(line_server, monkeypatch):
+    """
+    Route the outbox deliveries to the fake LINE server.
+    """
+    client = await open_client(line_server)
+    monkeypatch.setattr(outbox, "line_client", client)
+    yield client
+    await client.close()
+
+
+async def add_due_event(event_id: str, user_id: str, conn: psycopg.AsyncConnection) -> None:
+    await conn.execute(
+        """
+        INSERT INTO events (
+            event_id, event_name, user_id, last_done_at, reminder, reminder_cycle_count, reminder_cycle_unit,
+            next_reminder
+        )
+        VALUES (%s, 'brush teeth', %s, NOW() - INTERVAL '8 day', TRUE, 1, 'week', NOW() - INTERVAL '1 day')
+        """,
+        (event_id, user_id),
+    )
+
+
+async def enqueue(pool, *user_ids: str) -> None:
+    async with pool.connection() as conn:
+        for user_id in user_ids:
+            await add_user(user_id, conn)
+            await add_due_event(f"E-{user_id}", user_id, conn)
+        await db.enqueue_reminders([f"E-{user_id}" for user_id in user_ids], conn)
+
+
+async def get_outbox(conn: psycopg.AsyncConnection) -> dict[str, tuple]:
+    cur = await conn.execute("SELECT recipient_id, status, attempts FROM outbox")
+    return {recipient_id: (status, attempts) for recipient_id, status, attempts in await cur.fetchall()}
+
+
+async def test_claimed_notifications_are_leased(pool):
+    await enqueue(pool, "U1", "U2")
+
+    async with pool.connection() as conn:
+        claimed = await db.claim_outbox(LEASE_TOKEN, 10, timedelta(minutes=5), conn)
+    async with pool.connection() as conn:
+        # committed, so another sender does not claim them while they are being sent
+        assert await db.claim_outbox(LEASE_TOKEN, 10, timedelta(minutes=5), conn) == []
+        await conn.execute("UPDATE outbox SET available_at = NOW()")
+        # the lease ran out, e.g. the first sender died
+        reclaimed = await db.claim_outbox(LEASE_TOKEN, 10, timedelta(minutes=5), conn)
+
+    assert sorted(notification.recipient_id for notification, _ in claimed) == ["U1", "U2"]
+    assert sorted(event.event_id for _, event in reclaimed) == ["E-U1", "E-U2"]
+
+
+async def test_no_connection_is_held_while_sending(pool, line_server, sender):
+    await enqueue(pool, "U1", "U2", "U3")
+    in_use = []
+    line_server.on_request = lambda endpoint: in_use.append(db.get_pool_stats()["in_use"])
+
+    summary = await outbox.drain_outbox(batch_size=2)
+
+    assert in_use == [0, 0, 0]
+    assert (summary.claimed, summary.delivered, summary.api_calls) == (3, 3, 3)
+    async with pool.connection() as conn:
+        assert await get_outbox(conn) == {user_id: (OutboxStatus.DELIVERED, 0) for user_id in ("U1", "U2", "U3")}
+
+
+async def test_failed_notifications_are_postponed(pool, line_server, sender):
+    await enqueue(pool, "U1", "U2")
+    line_server.fail_recipients.add("U2")
+
+    summary = await outbox.drain_outbox()
+
+    assert (summary.delivered, summary.failed) == (1, 1)
+    async with pool.connection() as conn:
+        assert await get_outbox(conn) == {"U1": (OutboxStatus.DELIVERED, 0), "U2": (OutboxStatus.PENDING, 1)}
+        assert await db.claim_outbox(LEASE_TOKEN, 10, timedelta(minutes=5), conn) == []
+
+
+async def test_only_the_lease_holder_marks_notifications(pool):
+    await enqueue(pool, "U1")
+
+    async with pool.connection() as conn:
+        await db.claim_outbox(FIRST_TOKEN, 10, timedelta(minutes=5), conn)
+        # the lease of the first sender ran out and the notification was claimed by a second one
+        await conn.execute("UPDATE outbox SET available_at = NOW()")
+        ((notification, _),) = await db.claim_outbox(SECOND_TOKEN, 10, timedelta(minutes=5), conn)
+        ids = [notification.outbox_id]
+
+        assert await db.mark_outbox_delivered(ids, FIRST_TOKEN, conn) == 0
+        assert await db.mark_outbox_failed(ids, FIRST_TOKEN, "error", 5, timedelta(minutes=1), conn) == 0
+        assert await get_outbox(conn) == {"U1": (OutboxStatus.PENDING, 0)}
+        assert await db.mark_outbox_delivered(ids, SECOND_TOKEN, conn) == 1
+        assert await get_outbox(conn) == {"U1": (OutboxStatus.DELIVERED, 0)}
+
+
+async def test_unsent_notifications_are_released_before_the_lease_runs_out(pool, line_server, monkeypatch):
+    await enqueue(pool, "U1", "U2", "U3")
+    line_server.delay = 0.3
+    client = await open_client(line_server, timeout=0.5, max_retries=0)
+    monkeypatch.setattr(outbox, "line_client", client)
+    try:
+        # room for one request only, the others could outlive the lease
+        summary = await outbox.drain_outbox(lease=0.7)
+    finally:
+        await client.close()
+
+    assert (summary.claimed, summary.delivered, summary.released, summary.api_calls) == (3, 1, 2, 1)
+    async with pool.connection() as conn:
+        statuses = await get_outbox(conn)
+        assert sorted(statuses.values()) == [(OutboxStatus.DELIVERED, 0)] + [(OutboxStatus.PENDING, 0)] * 2
+        # released without an attempt, for the next drain to claim right away
+        assert len(await db.claim_outbox(LEASE_TOKEN, 10, timedelta(minutes=5), conn)) == 2
+
+
+async def test_replayed_requests_carry_the_same_retry_key(pool, line_server, sender):
+    await enqueue(pool, "U1")
+    line_server.fail_recipients.add("U1")
+    await outbox.drain_outbox()
+    async with pool.connection() as conn:
+        await conn.execute("UPDATE outbox SET available_at = NOW()")
+    line_server.fail_recipients.clear()
+
+    summary = await outbox.drain_outbox()
+
+    first, replay = line_server.requests["push"]
+    assert first["retry_key"] == replay["retry_key"]
+    assert summary.delivered == 1
+
+
+async def test_accepted_replay_counts_as_delivered(pool, line_server, sender):
+    await enqueue(pool, "U1")
+    # another sender already sent it with the same retry key
+    line_server.fail("push", 409, {"X-Line-Accepted-Request-Id": "request-id"})
+
+    summary = await outbox.drain_outbox()
+
+    assert (summary.delivered, summary.failed) == (1, 0)
+    assert sender.errors["push"] == 0
+    async with pool.connection() as conn:
+        assert await get_outbox(conn) == {"U1": (OutboxStatus.DELIVERED, 0)}
+
+
+async def test_reminder_run_does_not_wait_for_delivery(pool, line_server, sender):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        await add_due_event("E-U1", "U1", conn)
+    drainer = asyncio.create_task(outbox.drain_periodically(3600))
+    try:
+        summary = await run_reminders()
+        assert summary.notifications == 1
+        assert not line_server.requests["push"]
+
+        # woken up by the run instead of waiting for the interval
+        async with asyncio.timeout(5):
+            while not line_server.requests["push"]:
+                await asyncio.sleep(0.01)
+    finally:
+        drainer.cancel()
+        await asyncio.gather(drainer, return_exceptions=True)
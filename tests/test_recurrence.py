@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from routine_bot.constants import TZ_TAIPEI
+from routine_bot.enums import CycleUnit
+from routine_bot.recurrence import add_cycles, next_occurrence, next_occurrences, parse_cycle
+
+
+def taipei(*args: int) -> datetime:
+    return datetime(*args, tzinfo=TZ_TAIPEI)
+
+
+def test_month_cycle_from_the_31st_is_clamped_without_drifting():
+    anchor = taipei(2024, 1, 31)
+
+    assert add_cycles(anchor, 1, CycleUnit.MONTH) == taipei(2024, 2, 29)
+    assert add_cycles(anchor, 1, CycleUnit.MONTH, n=2) == taipei(2024, 3, 31)
+    assert next_occurrence(anchor, 1, CycleUnit.MONTH, now=taipei(2024, 2, 29, 12)) == taipei(2024, 3, 31)
+
+
+@pytest.mark.parametrize(
+    "count, unit, now, expected",
+    [
+        (3, CycleUnit.DAY, taipei(2025, 1, 20), taipei(2025, 1, 22)),
+        (1, CycleUnit.WEEK, taipei(2025, 3, 1), taipei(2025, 3, 5)),
+        (2, CycleUnit.MONTH, taipei(2025, 12, 25), taipei(2026, 1, 1)),
+    ],
+)
+def test_overdue_by_several_cycles_is_caught_up_at_once(count, unit, now, expected):
+    assert next_occurrence(taipei(2025, 1, 1), count, unit, now) == expected
+
+
+@pytest.mark.parametrize("unit", list(CycleUnit))
+def test_now_exactly_on_an_occurrence_moves_to_the_next_one(unit):
+    anchor = taipei(2025, 1, 31, 8)
+    occurrence = add_cycles(anchor, 2, unit, n=3)
+
+    assert next_occurrence(anchor, 2, unit, now=occurrence) == add_cycles(anchor, 2, unit, n=4)
+    assert next_occurrence(anchor, 2, unit, now=occurrence - timedelta(seconds=1)) == occurrence
+
+
+@pytest.mark.parametrize("unit", list(CycleUnit))
+def test_anchor_in_the_future_gives_the_first_cycle(unit):
+    anchor = taipei(2025, 6, 1)
+
+    assert next_occurrence(anchor, 1, unit, now=taipei(2025, 1, 1)) == add_cycles(anchor, 1, unit)
+
+
+def test_zero_cycle_count_is_rejected():
+    assert parse_cycle("0 day") is None
+    with pytest.raises(ValueError):
+        next_occurrence(taipei(2025, 1, 1), 0, CycleUnit.WEEK, now=taipei(2025, 2, 1))
+
+
+def test_events_without_a_cycle_are_left_alone():
+    now = taipei(2025, 1, 10)
+    anchors = [taipei(2025, 1, 1), taipei(2025, 1, 1)]
+
+    assert next_occurrences(anchors, [None, 1], [None, "week"], now) == [None, taipei(2025, 1, 15)]
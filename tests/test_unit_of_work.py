@@ -0,0 +1,57 @@
+import psycopg
+import pytest
+from helpers import add_user, new_event_chat, next_xid
+
+import routine_bot.async_db as db
+from routine_bot.enums import ChatStatus, NewEventSteps
+from routine_bot.handlers import handle_new_event_chat
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+
+async def get_chat_row(chat_id: str, conn: psycopg.AsyncConnection) -> tuple:
+    cur = await conn.execute("SELECT current_step, status FROM chats WHERE chat_id = %s", (chat_id,))
+    return await cur.fetchone()
+
+
+async def test_completing_a_new_event_commits_once(pool, database_url):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_TOGGLE_REMINDER)
+        await db.add_chat(chat, conn)
+
+    async with await psycopg.AsyncConnection.connect(database_url) as conn:
+        before = await next_xid(conn)
+        await handle_new_event_chat("不設定提醒", chat, conn)
+        after = await next_xid(conn)
+
+    # chat state, event, update and event count in a single transaction
+    assert after - before == 1
+    async with pool.connection() as conn:
+        assert await get_chat_row(chat.chat_id, conn) == (None, ChatStatus.COMPLETED)
+        assert await db.get_event_id("U1", "brush teeth", conn) is not None
+        assert (await db.get_user("U1", conn)).event_count == 1
+
+
+async def test_failed_step_rolls_back_every_write(pool, database_url):
+    async with pool.connection() as conn:
+        await add_user("U1", conn)
+        chat = new_event_chat("U1", NewEventSteps.INPUT_TOGGLE_REMINDER)
+        await db.add_chat(chat, conn)
+        # the event name was free when it was entered, but is taken by now
+        await conn.execute(
+            """
+            INSERT INTO events (event_id, event_name, user_id, last_done_at, reminder)
+            VALUES ('E0', 'brush teeth', 'U1', NOW(), FALSE)
+            """
+        )
+
+    async with await psycopg.AsyncConnection.connect(database_url) as conn:
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            await handle_new_event_chat("不設定提醒", chat, conn)
+
+    async with pool.connection() as conn:
+        assert await get_chat_row(chat.chat_id, conn) == (NewEventSteps.INPUT_TOGGLE_REMINDER, ChatStatus.ONGOING)
+        assert (await db.get_user("U1", conn)).event_count == 0
+        cur = await conn.execute("SELECT COUNT(*) FROM updates")
+        assert await cur.fetchone() == (0,)
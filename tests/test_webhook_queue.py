@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+from routine_bot.webhook import WebhookQueue
+
+
+class RecordingHandler:
+    """
+    Stands in for `AsyncWebhookHandler`, handling events with `text == "slow"` only once released.
+    """
+
+    def __init__(self):
+        self.handled: list[tuple[str, str]] = []
+        self.release = asyncio.Event()
+
+    async def dispatch(self, event) -> None:
+        if event.text == "slow":
+            await self.release.wait()
+        self.handled.append((event.source.user_id, event.text))
+
+
+def event(user_id: str, text: str) -> SimpleNamespace:
+    return SimpleNamespace(source=SimpleNamespace(user_id=user_id), text=text)
+
+
+async def test_slow_user_does_not_block_other_users():
+    handler = RecordingHandler()
+    queue = WebhookQueue(handler, maxsize=100, workers=2)
+    queue.start()
+    queue.submit([event("U1", "slow"), event("U1", "after slow")])
+    queue.submit([event(f"U{i}", "hi") for i in range(2, 12)])
+
+    async with asyncio.timeout(1):
+        while len(handler.handled) < 10:
+            await asyncio.sleep(0)
+    # every other user went through the remaining worker, U1's second event waits for its first
+    assert ("U1", "after slow") not in handler.handled
+
+    handler.release.set()
+    await queue.drain(timeout=1)
+    assert handler.handled[-2:] == [("U1", "slow"), ("U1", "after slow")]
+    assert queue.stats()["processed"] == 12
+
+
+async def test_events_of_a_user_are_handled_in_order():
+    handler = RecordingHandler()
+    queue = WebhookQueue(handler, maxsize=100, workers=4)
+    queue.start()
+    for i in range(20):
+        queue.submit([event("U1", str(i)), event("U2", str(i))])
+
+    await queue.drain(timeout=1)
+    assert [text for user_id, text in handler.handled if user_id == "U1"] == [str(i) for i in range(20)]
+    assert [text for user_id, text in handler.handled if user_id == "U2"] == [str(i) for i in range(20)]
+    assert queue.stats()["users"] == 0
+    assert queue.stats()["depth"] == 0